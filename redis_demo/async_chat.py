@@ -0,0 +1,73 @@
+"""
+Publisher e subscriber do chat em asyncio, usando o pool assíncrono compartilhado.
+
+Em Redis Cluster o chat usa Pub/Sub sharded (SPUBLISH/SSUBSCRIBE): cada
+mensagem fica no nó dono do slot do canal em vez de ir para todos os nós.
+
+Uso: python async_chat.py pub|sub
+"""
+
+import asyncio
+import sys
+
+from redis.asyncio.cluster import RedisCluster
+
+from async_redis_client import get_async_redis
+
+async def ainput(prompt):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, input, prompt)
+
+async def publish(canal, usuario, msg):
+    r = get_async_redis()
+    if isinstance(r, RedisCluster):
+        return await r.spublish(canal, f'{usuario}: {msg}')
+    return await r.publish(canal, f'{usuario}: {msg}')
+
+async def run_publisher():
+    canal = await ainput('Canal para publicar: ')
+    usuario = await ainput('Seu nome: ')
+    print('Digite mensagens para enviar. Ctrl+C para sair.')
+    while True:
+        msg = await ainput('Mensagem: ')
+        if msg.strip():
+            subscribers = await publish(canal, usuario, msg)
+            if isinstance(subscribers, int):
+                print(f'📤 Enviado para {subscribers} subscriber(s)')
+            else:
+                print('📤 Mensagem enviada')
+
+async def listen(canal, handler):
+    """Chama `handler(data)` (corrotina) para cada mensagem recebida em `canal`."""
+    r = get_async_redis()
+    pubsub = r.pubsub(ignore_subscribe_messages=True)
+    try:
+        if isinstance(r, RedisCluster):
+            await pubsub.ssubscribe(canal)
+            while True:
+                msg = await pubsub.get_sharded_message(ignore_subscribe_messages=True, timeout=1.0)
+                if msg and msg.get('type') == 'smessage' and msg.get('data'):
+                    await handler(msg['data'])
+        else:
+            await pubsub.subscribe(canal)
+            async for msg in pubsub.listen():
+                if msg and msg.get('type') == 'message' and msg.get('data'):
+                    await handler(msg['data'])
+    finally:
+        await pubsub.aclose()
+
+async def run_subscriber():
+    canal = await ainput('Canal para assinar: ')
+    print(f'👂 Aguardando mensagens no canal "{canal}"... Ctrl+C para sair.')
+
+    async def show(data):
+        print(f'📨 {data}')
+
+    await listen(canal, show)
+
+if __name__ == '__main__':
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'sub'
+    try:
+        asyncio.run(run_publisher() if mode == 'pub' else run_subscriber())
+    except KeyboardInterrupt:
+        print('\nSaindo do chat.')
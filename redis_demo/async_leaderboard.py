@@ -0,0 +1,48 @@
+"""
+Versão asyncio das operações de leaderboard (mesma API de leaderboard.py).
+
+As escritas passam pelo mesmo script de leaderboard_writes.py, então mantêm
+os complementos ativos para a chave (histograma, feed).
+"""
+
+from async_redis_client import get_async_redis
+from leaderboard_writes import write_async
+
+async def add_score(player, score, key='leaderboard_demo'):
+    await write_async(get_async_redis(), 'set', key, player, score)
+
+async def increment_score(player, increment=1.0, key='leaderboard_demo'):
+    return float(await write_async(get_async_redis(), 'incr', key, player, increment))
+
+async def get_top_players(limit=10, key='leaderboard_demo'):
+    r = get_async_redis()
+    result = await r.zrevrange(key, 0, limit-1, withscores=True)
+    return result if isinstance(result, list) else []
+
+async def get_player_rank(player, key='leaderboard_demo'):
+    r = get_async_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.zrevrank(key, player)
+        pipe.zscore(key, player)
+        rank, score = await pipe.execute()
+    if rank is not None and isinstance(rank, int):
+        return (rank+1, score)
+    return (None, None)
+
+async def get_players_around(player, range_size=2, key='leaderboard_demo'):
+    r = get_async_redis()
+    rank = await r.zrevrank(key, player)
+    if rank is None or not isinstance(rank, int):
+        return []
+    start = max(0, rank-range_size)
+    end = rank+range_size
+    players = await r.zrevrange(key, start, end, withscores=True)
+    if isinstance(players, list):
+        return [(start+i+1, p, score) for i, (p, score) in enumerate(players)]
+    return []
+
+async def remove_player(player, key='leaderboard_demo'):
+    return bool(await write_async(get_async_redis(), 'rem', key, player))
+
+async def clear_leaderboard(key='leaderboard_demo'):
+    await write_async(get_async_redis(), 'clear', key)
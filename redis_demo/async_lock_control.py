@@ -0,0 +1,5 @@
+async def acquire_lock(r, lock_key, expire=15):
+    return await r.set(lock_key, 'locked', nx=True, ex=expire)
+
+async def release_lock(r, lock_key):
+    await r.delete(lock_key)
@@ -0,0 +1,31 @@
+import redis.asyncio as aioredis
+from redis.asyncio.cluster import RedisCluster
+
+from redis_client import CONFIG, connection_kwargs
+
+def create_async_pool(config):
+    kwargs = connection_kwargs(config)
+    if config['unix_socket_path']:
+        kwargs['connection_class'] = aioredis.UnixDomainSocketConnection
+    # Pool bloqueante: milhares de corrotinas compartilham poucas conexões,
+    # esperando por uma livre em vez de abrir uma conexão por operação.
+    return aioredis.BlockingConnectionPool(max_connections=config['max_connections'],
+                                           timeout=None, **kwargs)
+
+def create_async_cluster(config):
+    """RedisCluster assíncrono; `max_connections` vale por nó."""
+    kwargs = connection_kwargs(config)
+    del kwargs['db']
+    return RedisCluster(max_connections=config['max_connections'], **kwargs)
+
+# Em cluster o cliente (com um pool por nó) é criado no primeiro uso
+POOL = None if CONFIG['cluster'] else create_async_pool(CONFIG)
+_cluster = None
+
+def get_async_redis():
+    global _cluster
+    if CONFIG['cluster']:
+        if _cluster is None:
+            _cluster = create_async_cluster(CONFIG)
+        return _cluster
+    return aioredis.Redis(connection_pool=POOL)
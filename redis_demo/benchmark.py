@@ -0,0 +1,294 @@
+"""
+Benchmark headless de leaderboard, Pub/Sub e locks.
+
+Executa os cenários contra o Redis configurado (veja redis_client.py) com
+N workers (threads ou processos) durante um tempo fixo e grava um JSON com
+vazão e latências (p50/p99/p999 + histograma) por operação, para comparar
+execuções e caminhos (ex.: increment-naive x increment-aggregated).
+
+Exemplos:
+    python benchmark.py leaderboard --concurrency 16 --duration 10 --read-ratio 0.8
+    python benchmark.py rank-naive rank-bulk --players 100000 --output bench.json
+    python benchmark.py pubsub --subscribers 20
+    python benchmark.py lock --concurrency 8 --hold-ms 2
+    python benchmark.py publish-naive publish-limited --players 1000
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import leaderboard
+import publisher
+from lock_control import RedisLock
+from rate_limiter import RateLimiter, Rule
+from redis_client import get_redis
+
+BENCH_KEY = 'bench:leaderboard'
+
+# Limites dos cenários publish-*: bem acima da vazão possível, para medir o
+# caminho em que a mensagem é aceita e publicada (com as regras do chat, quase
+# tudo seria negado pelo limite de 100/s do canal)
+BENCH_USER_RULE = Rule('bench-user', 'bucket', 10**9, 1.0)
+BENCH_CHANNEL_RULE = Rule('bench-channel', 'sliding', 10**9, 1.0)
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values)-1, int(len(sorted_values)*p/100))]
+
+def summarize(latencies, elapsed):
+    """Resumo de uma lista de latências (segundos); histograma em buckets de 2^n µs."""
+    values = sorted(latencies)
+    histogram = {}
+    for v in values:
+        bucket = 1
+        while bucket < v*1e6:
+            bucket *= 2
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+    us = lambda v: round(v*1e6, 1)
+    return {
+        'count': len(values),
+        'throughput': round(len(values)/elapsed, 1) if elapsed else 0.0,
+        'mean_us': us(sum(values)/len(values)) if values else 0.0,
+        'p50_us': us(percentile(values, 50)),
+        'p99_us': us(percentile(values, 99)),
+        'p999_us': us(percentile(values, 99.9)),
+        'max_us': us(values[-1]) if values else 0.0,
+        'histogram_us': {f"le_{k}": n for k, n in sorted(histogram.items())},
+    }
+
+def _player(rng, params):
+    return f"player:{rng.randrange(params['players'])}"
+
+def _timed(results, op, func, *args):
+    start = time.perf_counter()
+    func(*args)
+    results.setdefault(op, []).append(time.perf_counter() - start)
+
+def _timed_decision(results, op, func, *args):
+    # Aceitas e negadas em operações separadas: o 'count' de cada uma é o total
+    start = time.perf_counter()
+    allowed = func(*args).allowed
+    results.setdefault(f"{op}.{'allowed' if allowed else 'denied'}", []).append(time.perf_counter() - start)
+
+
+# Cenários de workers: recebem (params, worker_id, deadline) e devolvem {op: [latências]}
+
+def scenario_leaderboard(params, worker_id, deadline):
+    rng = random.Random(worker_id)
+    results = {}
+    while time.monotonic() < deadline:
+        if rng.random() < params['read_ratio']:
+            if rng.random() < 0.5:
+                _timed(results, 'get_top_players', leaderboard.get_top_players, 10, BENCH_KEY)
+            else:
+                _timed(results, 'get_players_around', leaderboard.get_players_around,
+                       _player(rng, params), 2, BENCH_KEY)
+        elif rng.random() < 0.5:
+            _timed(results, 'add_score', leaderboard.add_score,
+                   _player(rng, params), rng.randrange(100000), BENCH_KEY)
+        else:
+            _timed(results, 'increment_score', leaderboard.increment_score,
+                   _player(rng, params), 1, BENCH_KEY)
+    return results
+
+def scenario_increment_naive(params, worker_id, deadline):
+    rng = random.Random(worker_id)
+    results = {}
+    while time.monotonic() < deadline:
+        _timed(results, 'increment_score', leaderboard.increment_score, _player(rng, params), 1, BENCH_KEY)
+    return results
+
+def scenario_increment_aggregated(params, worker_id, deadline):
+    rng = random.Random(worker_id)
+    results = {}
+    agg = leaderboard.ScoreAggregator()
+    while time.monotonic() < deadline:
+        _timed(results, 'aggregator.increment', agg.increment, _player(rng, params), 1, BENCH_KEY)
+    _timed(results, 'aggregator.close', agg.close)
+    return results
+
+def scenario_rank_naive(params, worker_id, deadline):
+    rng = random.Random(worker_id)
+    results = {}
+    while time.monotonic() < deadline:
+        batch = [_player(rng, params) for _ in range(params['batch'])]
+        _timed(results, f"get_player_rank x{params['batch']}",
+               lambda: [leaderboard.get_player_rank(p, BENCH_KEY) for p in batch])
+    return results
+
+def scenario_rank_bulk(params, worker_id, deadline):
+    rng = random.Random(worker_id)
+    results = {}
+    while time.monotonic() < deadline:
+        batch = [_player(rng, params) for _ in range(params['batch'])]
+        _timed(results, f"get_player_ranks x{params['batch']}",
+               leaderboard.get_player_ranks, batch, BENCH_KEY)
+    return results
+
+def scenario_lock(params, worker_id, deadline):
+    results = {}
+    lock = RedisLock(get_redis(), 'bench:lock', expire=5)
+    hold = params['hold_ms']/1000
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        if lock.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            results.setdefault('lock.acquire', []).append(time.perf_counter() - start)
+            time.sleep(hold)
+            lock.release()
+    return results
+
+def scenario_publish_naive(params, worker_id, deadline):
+    # Limite e PUBLISH em chamadas separadas: 2 idas e voltas por mensagem
+    rng = random.Random(worker_id)
+    results = {}
+    r = get_redis()
+    limiter = RateLimiter('bench:ratelimit')
+
+    def send(user):
+        decision = limiter.check([(BENCH_USER_RULE, user), (BENCH_CHANNEL_RULE, 'bench:chat')])
+        if decision.allowed:
+            r.publish('bench:chat', f"{user}: oi")
+        return decision
+
+    while time.monotonic() < deadline:
+        _timed_decision(results, 'check+publish', send, _player(rng, params))
+    return results
+
+def scenario_publish_limited(params, worker_id, deadline):
+    rng = random.Random(worker_id)
+    results = {}
+    limiter = RateLimiter('bench:ratelimit')
+    while time.monotonic() < deadline:
+        _timed_decision(results, 'publish_limited', publisher.publish_limited, limiter,
+                        'bench:chat', _player(rng, params), 'oi', BENCH_USER_RULE, BENCH_CHANNEL_RULE)
+    return results
+
+WORKER_SCENARIOS = {
+    'leaderboard': scenario_leaderboard,
+    'increment-naive': scenario_increment_naive,
+    'increment-aggregated': scenario_increment_aggregated,
+    'rank-naive': scenario_rank_naive,
+    'rank-bulk': scenario_rank_bulk,
+    'lock': scenario_lock,
+    'publish-naive': scenario_publish_naive,
+    'publish-limited': scenario_publish_limited,
+}
+
+# Cenários que leem/escrevem o leaderboard de teste
+SEEDED_SCENARIOS = ('leaderboard', 'increment-naive', 'increment-aggregated', 'rank-naive', 'rank-bulk')
+
+def _run_worker(name, params, worker_id, duration):
+    # Em processos o relógio monotônico não é compartilhado: recebemos a duração
+    deadline = time.monotonic() + duration
+    if params['mode'] == 'process':
+        sys.stdout = open(os.devnull, 'w')
+    return WORKER_SCENARIOS[name](params, worker_id, deadline)
+
+def seed_leaderboard(players):
+    r = get_redis()
+    r.delete(BENCH_KEY)
+    rng = random.Random(0)
+    for start in range(0, players, 10000):
+        r.zadd(BENCH_KEY, {f"player:{i}": rng.randrange(100000)
+                           for i in range(start, min(players, start+10000))})
+
+def run_worker_scenario(name, params):
+    executor_cls = ProcessPoolExecutor if params['mode'] == 'process' else ThreadPoolExecutor
+    kwargs = {'mp_context': multiprocessing.get_context('spawn')} if params['mode'] == 'process' else {}
+    start = time.perf_counter()
+    # As funções do leaderboard imprimem a cada chamada; silencia durante a medição
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        with executor_cls(max_workers=params['concurrency'], **kwargs) as pool:
+            futures = [pool.submit(_run_worker, name, params, n, params['duration'])
+                       for n in range(params['concurrency'])]
+            merged = {}
+            for future in futures:
+                for op, values in future.result().items():
+                    merged.setdefault(op, []).extend(values)
+    elapsed = time.perf_counter() - start
+    return {op: summarize(values, elapsed) for op, values in merged.items()}
+
+def run_pubsub(params):
+    """Fan-out: um publisher, N subscribers; latência = recebimento - envio."""
+    r = get_redis()
+    channel = 'bench:pubsub'
+    latencies = []
+    lock = threading.Lock()
+    ready = threading.Barrier(params['subscribers']+1)
+    expected = params['messages']
+
+    def subscriber():
+        pubsub = r.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(channel)
+        pubsub.get_message(timeout=1.0)
+        ready.wait()
+        received = 0
+        local = []
+        while received < expected:
+            msg = pubsub.get_message(timeout=5.0)
+            if msg is None:
+                break
+            local.append(time.perf_counter() - float(msg['data']))
+            received += 1
+        pubsub.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=subscriber) for _ in range(params['subscribers'])]
+    for t in threads:
+        t.start()
+    ready.wait()
+    start = time.perf_counter()
+    for _ in range(expected):
+        r.publish(channel, repr(time.perf_counter()))
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return {'publish->deliver': summarize(latencies, elapsed),
+            'delivered': len(latencies), 'expected': expected*params['subscribers']}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de leaderboard, Pub/Sub e locks")
+    parser.add_argument('scenarios', nargs='+', choices=list(WORKER_SCENARIOS) + ['pubsub'])
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--duration', type=float, default=5.0, help="segundos por cenário")
+    parser.add_argument('--players', type=int, default=10000, help="cardinalidade do leaderboard")
+    parser.add_argument('--read-ratio', type=float, default=0.8)
+    parser.add_argument('--batch', type=int, default=100, help="jogadores por consulta em rank-*")
+    parser.add_argument('--hold-ms', type=float, default=1.0, help="tempo com o lock em mãos")
+    parser.add_argument('--subscribers', type=int, default=10)
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--no-seed', action='store_true', help="não recria o leaderboard de teste")
+    parser.add_argument('--output', help="arquivo JSON de saída (padrão: stdout)")
+    params = vars(parser.parse_args(argv))
+
+    report = {'params': params, 'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': {}}
+    if not params['no_seed'] and any(s in SEEDED_SCENARIOS for s in params['scenarios']):
+        seed_leaderboard(params['players'])
+    for name in params['scenarios']:
+        print(f"▶️ {name}...", file=sys.stderr)
+        if name == 'pubsub':
+            report['results'][name] = run_pubsub(params)
+        else:
+            report['results'][name] = run_worker_scenario(name, params)
+
+    output = json.dumps(report, indent=2)
+    if params['output']:
+        with open(params['output'], 'w') as f:
+            f.write(output)
+        print(f"✅ Resultados gravados em {params['output']}", file=sys.stderr)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
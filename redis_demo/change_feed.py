@@ -0,0 +1,222 @@
+"""
+Feed de mudanças do top-N: atualizações empurradas em vez de polling.
+
+Com o feed ativo para um leaderboard (leaderboard.enable_change_feed), cada
+escrita compara a posição do jogador antes e depois e, se ela envolve o
+top-N, publica em `{<key>}:feed` um delta compacto em JSON:
+
+    {"seq": 42, "p": "alice", "s": "1300", "o": 5, "n": 2}   (o/n: posição 0-based antes/depois)
+    + "left": "bob"               quando alguém foi empurrado para fora do top-N
+    + "in": ["carol", "990"]      quando alguém subiu para o top-N no lugar de outro
+    {"seq": 43, "reset": true}    quando o leaderboard foi apagado ou cortado
+
+As pontuações vão como strings, exatamente como o Redis as guarda (números
+do cjson/tostring têm só 14 dígitos).
+
+A configuração (N, canal, PUBLISH ou SPUBLISH) fica no Redis, em
+`{<key>}:feed:conf`: os scripts de escrita (ver leaderboard_writes.py)
+incluem FEED_LUA e publicam os deltas em qualquer processo que grave pelos
+módulos do repositório, tenha ele ativado o feed ou não. O mesmo script
+atualiza o histograma, se houver, então feed e percentis convivem na chave.
+
+`seq` é um contador por leaderboard. TopNMirror mantém uma cópia local do
+top-N aplicando os deltas e só refaz a leitura completa quando detecta um
+buraco na sequência (ou um reset). Quem grava por fora dos scripts (ex.:
+uma carga em massa) deve chamar ChangeFeed.reset() no fim.
+
+Em Redis Cluster o canal e o contador ficam no slot do leaderboard e os
+deltas usam Pub/Sub sharded (SPUBLISH/SSUBSCRIBE).
+"""
+
+import json
+import threading
+
+from dispatcher import PubSubDispatcher
+from lua_scripts import REGISTRY
+from redis_client import colocated, get_redis, is_cluster
+
+def feed_keys(key):
+    """Chaves do feed de `key`, na ordem esperada por feed_open: seq, conf."""
+    return [colocated(key, 'feed:seq'), colocated(key, 'feed:conf')]
+
+# Funções Lua compartilhadas pelos scripts que gravam no ZSET. feed_open
+# devolve nil se `key` não tem feed ativo; as demais aceitam esse nil.
+FEED_LUA = """
+local function feed_open(zkey, seqkey, confkey)
+    local c = redis.call('HMGET', confkey, 'top_n', 'channel', 'command')
+    if not c[1] then
+        return nil
+    end
+    return {zkey = zkey, seqkey = seqkey, n = tonumber(c[1]), channel = c[2], command = c[3]}
+end
+local function feed_publish(F, delta)
+    delta.seq = redis.call('INCR', F.seqkey)
+    redis.call(F.command, F.channel, cjson.encode(delta))
+end
+local function feed_reset(F)
+    if F then
+        feed_publish(F, {reset = true})
+    end
+end
+local function feed_rank(F, player)
+    if F then
+        return redis.call('ZREVRANK', F.zkey, player)
+    end
+    return false
+end
+local function feed_after(F, player, old, score)
+    -- old: posição antes (false se não existia); score: string ou nil se removido
+    if not F then
+        return
+    end
+    local new = score and redis.call('ZREVRANK', F.zkey, player)
+    local was_top = old and old < F.n
+    local is_top = new and new < F.n
+    if not (was_top or is_top) then
+        return
+    end
+    local delta = {p = player, s = score, o = old or nil, n = new or nil}
+    if is_top and not was_top then
+        local out = redis.call('ZREVRANGE', F.zkey, F.n, F.n)
+        if out[1] then delta.left = out[1] end
+    elseif was_top and not is_top then
+        local e = redis.call('ZREVRANGE', F.zkey, F.n - 1, F.n - 1, 'WITHSCORES')
+        if e[1] then delta['in'] = {e[1], e[2]} end
+    end
+    feed_publish(F, delta)
+end
+local function feed_trimmed(F, cap)
+    -- O corte remove as últimas posições: só mexe no top-N se cap < N
+    if F and cap < F.n then
+        feed_reset(F)
+    end
+end
+"""
+
+# Avisa os espelhos para refazer a leitura. KEYS: seq, conf
+REGISTRY.register('feed_reset', FEED_LUA + """
+feed_reset(feed_open(nil, KEYS[1], KEYS[2]))
+return 1
+""")
+
+# Foto consistente do top-N junto com o seq atual
+REGISTRY.register('feed_snapshot', """
+local seq = tonumber(redis.call('GET', KEYS[2]) or '0')
+return {seq, redis.call('ZREVRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1, 'WITHSCORES')}
+""")
+
+
+class ChangeFeed:
+    """Configuração do feed de um leaderboard (guardada no Redis)."""
+
+    def __init__(self, key='leaderboard_demo', top_n=10):
+        self.key = key
+        self.top_n = top_n
+        self.channel = colocated(key, 'feed')
+        self.seq_key, self.conf_key = feed_keys(key)
+        self.sharded = is_cluster(get_redis())
+
+    @classmethod
+    def load(cls, key='leaderboard_demo'):
+        """Feed ativo para `key` (ativado por qualquer processo), ou None."""
+        top_n = get_redis().hget(colocated(key, 'feed:conf'), 'top_n')
+        return cls(key, int(top_n)) if top_n is not None else None
+
+    def enable(self):
+        """Liga a publicação de deltas em todos os scripts de escrita de `key`."""
+        get_redis().hset(self.conf_key, mapping={
+            'top_n': self.top_n, 'channel': self.channel,
+            'command': 'SPUBLISH' if self.sharded else 'PUBLISH'})
+        # Espelhos já conectados podem estar com outro N
+        self.reset()
+        return self
+
+    def disable(self):
+        get_redis().delete(self.conf_key)
+
+    def reset(self):
+        """Avisa os espelhos para refazer a leitura (após escritas feitas por fora dos scripts)."""
+        REGISTRY.call(get_redis(), 'feed_reset', [self.seq_key, self.conf_key])
+
+
+class TopNMirror:
+    """
+    Cópia local do top-N alimentada pelo feed. Use top() para ler; o
+    callback opcional on_change(top) é chamado a cada atualização.
+    """
+
+    def __init__(self, key='leaderboard_demo', top_n=10, on_change=None, dispatcher=None):
+        self.feed = ChangeFeed(key, top_n)
+        self.on_change = on_change
+        self.stats = {'deltas': 0, 'resyncs': 0, 'gaps': 0}
+        self._scores = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._own_dispatcher = dispatcher is None
+        # Um único worker garante que os deltas são aplicados em ordem
+        self._dispatcher = dispatcher or PubSubDispatcher(workers=1)
+        if self.feed.sharded:
+            self._dispatcher.ssubscribe(self.feed.channel, self._on_message)
+        else:
+            self._dispatcher.subscribe(self.feed.channel, self._on_message)
+
+    def start(self):
+        # Inscreve antes da foto: deltas perdidos nesse intervalo já estão na
+        # foto ou aparecem como buraco no seq e disparam um resync
+        if self._own_dispatcher:
+            self._dispatcher.start()
+        self.resync()
+        return self
+
+    def stop(self):
+        if self._own_dispatcher:
+            self._dispatcher.stop()
+        else:
+            self._dispatcher.unsubscribe(self.feed.channel)
+
+    def top(self):
+        with self._lock:
+            ordered = sorted(self._scores.items(), key=lambda item: (item[1], item[0]), reverse=True)
+        return ordered[:self.feed.top_n]
+
+    def resync(self):
+        seq, flat = REGISTRY.call(get_redis(), 'feed_snapshot',
+                                  [self.feed.key, self.feed.seq_key], [self.feed.top_n])
+        with self._lock:
+            self._seq = seq
+            self._scores = {p: float(s) for p, s in zip(flat[0::2], flat[1::2])}
+        self.stats['resyncs'] += 1
+        self._notify()
+
+    def _on_message(self, data, channel):
+        delta = json.loads(data)
+        with self._lock:
+            seq = delta['seq']
+            if seq <= self._seq:
+                return
+            gap = seq != self._seq + 1 or delta.get('reset')
+            if not gap:
+                self._apply(delta)
+                self._seq = seq
+        if gap:
+            self.stats['gaps'] += not delta.get('reset')
+            self.resync()
+            return
+        self.stats['deltas'] += 1
+        self._notify()
+
+    def _apply(self, delta):
+        player = delta['p']
+        if 'n' in delta and delta['n'] < self.feed.top_n:
+            self._scores[player] = float(delta['s'])
+        else:
+            self._scores.pop(player, None)
+        if 'left' in delta:
+            self._scores.pop(delta['left'], None)
+        if 'in' in delta:
+            entered, score = delta['in']
+            self._scores[entered] = float(score)
+
+    def _notify(self):
+        if self.on_change:
+            self.on_change(self.top())
@@ -0,0 +1,213 @@
+"""
+Dispatcher de Pub/Sub: uma conexão, vários canais/padrões, handlers em paralelo.
+
+Uma thread leitora bloqueia na conexão de Pub/Sub (sem acordar a cada
+segundo) e entrega cada mensagem a um pool de workers. Cada handler é
+atendido sempre pelo mesmo worker, o que preserva a ordem das mensagens
+por handler. As filas dos workers são limitadas: quando enchem, a leitora
+espera (backpressure) em vez de acumular memória sem limite.
+
+Handlers registrados com `batch_size` recebem listas de mensagens
+(micro-batching), entregues quando o lote enche ou após `batch_delay`.
+
+ssubscribe() usa Pub/Sub sharded (SSUBSCRIBE, Redis 7+): em cluster a
+mensagem vai só para o nó dono do slot do canal, em vez de ser repassada a
+todos os nós como no PUBLISH clássico.
+"""
+
+import queue
+import threading
+import time
+
+from redis_client import get_redis, is_cluster
+
+_STOP = object()
+# Em cluster cada nó tem sua conexão de Pub/Sub e a leitora alterna entre elas
+CLUSTER_POLL = 0.1
+
+
+class _Handler:
+    def __init__(self, name, func, batch_size, batch_delay):
+        self.name = name
+        self.func = func
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.pending = []
+        self.first_at = None
+        self.lock = threading.Lock()
+
+
+class PubSubDispatcher:
+    def __init__(self, r=None, workers=4, queue_size=1000, read_timeout=60.0):
+        self.r = r or get_redis()
+        self.read_timeout = read_timeout
+        self.stats = {'received': 0, 'handled': 0, 'batches': 0, 'errors': 0}
+        self._pubsub = self.r.pubsub(ignore_subscribe_messages=True)
+        self._channels = {}
+        self._patterns = {}
+        self._shards = {}
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads = []
+        self._running = False
+        self._stats_lock = threading.Lock()
+
+    def subscribe(self, channel, handler, batch_size=None, batch_delay=0.05):
+        """Registra `handler(data, channel)` (ou `handler(lista)` em modo lote)."""
+        entry = _Handler(channel, handler, batch_size, batch_delay)
+        self._channels[channel] = entry
+        self._pubsub.subscribe(channel)
+        return entry
+
+    def psubscribe(self, pattern, handler, batch_size=None, batch_delay=0.05):
+        entry = _Handler(pattern, handler, batch_size, batch_delay)
+        self._patterns[pattern] = entry
+        self._pubsub.psubscribe(pattern)
+        return entry
+
+    def ssubscribe(self, channel, handler, batch_size=None, batch_delay=0.05):
+        """Como subscribe(), mas em um canal sharded (publicado com SPUBLISH)."""
+        entry = _Handler(channel, handler, batch_size, batch_delay)
+        self._shards[channel] = entry
+        self._pubsub.ssubscribe(channel)
+        return entry
+
+    def unsubscribe(self, name):
+        if self._channels.pop(name, None):
+            self._pubsub.unsubscribe(name)
+        if self._patterns.pop(name, None):
+            self._pubsub.punsubscribe(name)
+        if self._shards.pop(name, None):
+            self._pubsub.sunsubscribe(name)
+
+    def start(self):
+        self._running = True
+        for n, q in enumerate(self._queues):
+            t = threading.Thread(target=self._work, args=(q,), name=f'pubsub-worker-{n}', daemon=True)
+            t.start()
+            self._threads.append(t)
+        if any(e.batch_size for e in self._all_handlers()):
+            t = threading.Thread(target=self._flush_loop, name='pubsub-batcher', daemon=True)
+            t.start()
+            self._threads.append(t)
+        self._reader = threading.Thread(target=self._read, name='pubsub-reader', daemon=True)
+        self._reader.start()
+
+    def stop(self):
+        self._running = False
+        # Cancelar as inscrições acorda a leitora bloqueada em get_message
+        if self._shards:
+            self._pubsub.sunsubscribe()
+        if self._channels or self._patterns or not self._shards:
+            self._pubsub.unsubscribe()
+            self._pubsub.punsubscribe()
+        self._reader.join()
+        self._pubsub.close()
+        for entry in self._all_handlers():
+            self._flush(entry, force=True)
+        for q in self._queues:
+            q.put(_STOP)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def run_forever(self):
+        self.start()
+        try:
+            self._reader.join()
+        finally:
+            if self._running:
+                self.stop()
+
+    def _all_handlers(self):
+        return list(self._channels.values()) + list(self._patterns.values()) + list(self._shards.values())
+
+    def _queue_for(self, entry):
+        return self._queues[hash(entry.name) % len(self._queues)]
+
+    def _next_message(self):
+        if not self._shards:
+            return self._pubsub.get_message(timeout=self.read_timeout)
+        if not is_cluster(self.r):
+            # Servidor único: canais sharded chegam pela mesma conexão
+            return self._pubsub.get_sharded_message(timeout=self.read_timeout)
+        msg = self._pubsub.get_sharded_message(timeout=CLUSTER_POLL)
+        if msg is None and (self._channels or self._patterns):
+            msg = self._pubsub.get_message(timeout=CLUSTER_POLL)
+        return msg
+
+    def _read(self):
+        while self._running:
+            try:
+                msg = self._next_message()
+            except Exception as e:
+                if not self._running:
+                    return
+                print(f'⚠️ Erro na conexão Pub/Sub: {e}')
+                time.sleep(0.5)
+                continue
+            if not msg:
+                continue
+            if msg['type'] == 'message':
+                entry = self._channels.get(msg['channel'])
+            elif msg['type'] == 'pmessage':
+                entry = self._patterns.get(msg['pattern'])
+            elif msg['type'] == 'smessage':
+                entry = self._shards.get(msg['channel'])
+            else:
+                continue
+            if entry is None:
+                continue
+            self.stats['received'] += 1
+            if entry.batch_size:
+                with entry.lock:
+                    if not entry.pending:
+                        entry.first_at = time.monotonic()
+                    entry.pending.append(msg)
+                    full = len(entry.pending) >= entry.batch_size
+                if full:
+                    self._flush(entry, force=True)
+            else:
+                # put() bloqueia quando a fila está cheia: backpressure
+                self._queue_for(entry).put((entry, msg))
+
+    def _flush(self, entry, force=False):
+        # put() sob o lock: leitora e thread de lotes não invertem a ordem dos lotes
+        # (se a fila estiver cheia, ambas esperam, o que também é backpressure)
+        with entry.lock:
+            if not entry.pending:
+                return
+            if not force and time.monotonic() - entry.first_at < entry.batch_delay:
+                return
+            batch, entry.pending = entry.pending, []
+            self._queue_for(entry).put((entry, batch))
+
+    def _flush_loop(self):
+        delay = min(e.batch_delay for e in self._all_handlers() if e.batch_size)
+        while self._running:
+            time.sleep(delay)
+            for entry in self._all_handlers():
+                if entry.batch_size:
+                    self._flush(entry)
+
+    def _work(self, q):
+        while True:
+            item = q.get()
+            if item is _STOP:
+                return
+            entry, payload = item
+            try:
+                if isinstance(payload, list):
+                    entry.func(payload)
+                    handled = len(payload)
+                else:
+                    entry.func(payload['data'], payload['channel'])
+                    handled = 1
+            except Exception as e:
+                with self._stats_lock:
+                    self.stats['errors'] += 1
+                print(f'❌ Erro no handler de {entry.name}: {e}')
+                continue
+            with self._stats_lock:
+                self.stats['handled'] += handled
+                if isinstance(payload, list):
+                    self.stats['batches'] += 1
@@ -0,0 +1,212 @@
+"""
+Serviço HTTP/JSON do leaderboard (asyncio, só biblioteca padrão + redis-py).
+
+Rotas:
+    GET  /top?limit=10&key=...
+    GET  /rank?player=...&key=...
+    GET  /around?player=...&range=2&key=...
+    POST /scores     {"player": ..., "score": ..., "key": ...}
+    POST /increment  {"player": ..., "increment": ..., "key": ...}
+
+Leituras idênticas simultâneas são coalescidas (single-flight): só a
+primeira vai ao Redis e as demais aguardam o mesmo resultado. Escritas são
+agrupadas em micro-lotes e enviadas em um único pipeline a cada
+`batch_delay_ms` ou `max_batch` escritas, pelo script de
+leaderboard_writes.py (que mantém os complementos da chave).
+
+Uso: python http_service.py --port 8080
+"""
+
+import argparse
+import asyncio
+import json
+from urllib.parse import parse_qs, urlsplit
+
+from redis.exceptions import NoScriptError
+
+import async_leaderboard
+from async_redis_client import get_async_redis
+from leaderboard_writes import queue_write_async, write_async
+
+DEFAULT_KEY = 'leaderboard_demo'
+
+
+class SingleFlight:
+    """Compartilha uma mesma chamada em andamento entre quem pede a mesma chave."""
+
+    def __init__(self):
+        self._inflight = {}
+        self.stats = {'calls': 0, 'coalesced': 0}
+
+    async def do(self, key, factory):
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(future)
+        self.stats['calls'] += 1
+        future = asyncio.ensure_future(factory())
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+
+class WriteBatcher:
+    """Agrupa escritas em pipelines; cada escrita recebe o próprio resultado."""
+
+    def __init__(self, max_batch=500, batch_delay_ms=2):
+        self.max_batch = max_batch
+        self.batch_delay = batch_delay_ms/1000
+        self.stats = {'writes': 0, 'pipelines': 0}
+        self._pending = []
+        self._timer = None
+
+    def submit(self, op, key, player, value):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((op, key, player, value, future))
+        if len(self._pending) >= self.max_batch:
+            self._schedule(0)
+        elif self._timer is None:
+            self._schedule(self.batch_delay)
+        return future
+
+    def _schedule(self, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(
+            delay, lambda: asyncio.ensure_future(self.flush()))
+
+    async def flush(self):
+        self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        r = get_async_redis()
+        try:
+            async with r.pipeline(transaction=False) as pipe:
+                for op, key, player, value, _ in batch:
+                    await queue_write_async(pipe, r, op, key, player, value)
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.stats['writes'] += len(batch)
+        self.stats['pipelines'] += 1
+        for (op, key, player, value, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, NoScriptError):
+                # O EVALSHA não rodou (cache de scripts perdido): repetir é seguro
+                try:
+                    result = await write_async(r, op, key, player, value)
+                except Exception as e:
+                    result = e
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class LeaderboardService:
+    def __init__(self, max_batch=500, batch_delay_ms=2):
+        self.reads = SingleFlight()
+        self.writes = WriteBatcher(max_batch, batch_delay_ms)
+
+    async def handle(self, method, path, query, body):
+        key = query.get('key') or body.get('key') or DEFAULT_KEY
+        if method == 'GET' and path == '/top':
+            limit = int(query.get('limit', 10))
+            top = await self.reads.do(('top', key, limit),
+                                      lambda: async_leaderboard.get_top_players(limit, key))
+            return 200, [{'rank': i, 'player': p, 'score': s} for i, (p, s) in enumerate(top, 1)]
+        if method == 'GET' and path == '/rank':
+            player = query['player']
+            rank, score = await self.reads.do(('rank', key, player),
+                                              lambda: async_leaderboard.get_player_rank(player, key))
+            if rank is None:
+                return 404, {'error': f"Jogador '{player}' não encontrado"}
+            return 200, {'player': player, 'rank': rank, 'score': score}
+        if method == 'GET' and path == '/around':
+            player = query['player']
+            size = int(query.get('range', 2))
+            around = await self.reads.do(('around', key, player, size),
+                                         lambda: async_leaderboard.get_players_around(player, size, key))
+            if not around:
+                return 404, {'error': f"Jogador '{player}' não encontrado"}
+            return 200, [{'rank': pos, 'player': p, 'score': s} for pos, p, s in around]
+        if method == 'POST' and path == '/scores':
+            await self.writes.submit('set', key, body['player'], float(body['score']))
+            return 200, {'player': body['player'], 'score': float(body['score'])}
+        if method == 'POST' and path == '/increment':
+            increment = float(body.get('increment', 1))
+            total = await self.writes.submit('incr', key, body['player'], increment)
+            return 200, {'player': body['player'], 'score': float(total)}
+        if method == 'GET' and path == '/stats':
+            return 200, {'reads': self.reads.stats, 'writes': self.writes.stats}
+        return 404, {'error': 'Rota não encontrada'}
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                raw = await reader.readexactly(length) if length else b''
+                url = urlsplit(target)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                try:
+                    body = json.loads(raw) if raw else {}
+                    status, payload = await self.handle(method, url.path, query, body)
+                except (KeyError, ValueError) as e:
+                    status, payload = 400, {'error': f"Requisição inválida: {e}"}
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+                data = json.dumps(payload).encode()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(host='0.0.0.0', port=8080, **options):
+    service = LeaderboardService(**options)
+    server = await asyncio.start_server(service.serve_connection, host, port)
+    print(f"🌐 Leaderboard HTTP em http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP/JSON do leaderboard")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch', type=int, default=500, help="escritas por pipeline")
+    parser.add_argument('--batch-delay-ms', type=float, default=2, help="espera máxima de uma escrita")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, max_batch=args.max_batch,
+                          batch_delay_ms=args.batch_delay_ms))
+    except KeyboardInterrupt:
+        print("\n👋 Serviço encerrado")
+
+if __name__ == '__main__':
+    main()
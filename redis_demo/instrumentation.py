@@ -0,0 +1,239 @@
+"""
+Instrumentação dos comandos Redis e das operações de alto nível.
+
+Quando REDIS_TRACE=1, redis_client cria clientes TracedRedis, que medem cada
+comando (contagem, erros, latência, bytes enviados/recebidos) e cada
+pipeline (uma ida e volta com vários comandos). Funções decoradas com
+@traced_operation acumulam quantos round trips e comandos cada chamada fez,
+ex.: get_player_rank -> 1 RTT.
+
+As métricas podem ser exportadas no formato texto do Prometheus com
+export_prometheus() ou servidas por HTTP com start_metrics_server().
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import redis
+from redis.client import Pipeline
+
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_current_op = contextvars.ContextVar('redis_operation', default=None)
+
+
+def _payload_size(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, (list, tuple, set)):
+        return sum(_payload_size(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_payload_size(k) + _payload_size(v) for k, v in value.items())
+    if value is None:
+        return 0
+    return len(str(value))
+
+
+class _Series:
+    __slots__ = ('count', 'errors', 'total', 'buckets', 'round_trips', 'commands', 'bytes_out', 'bytes_in')
+
+    def __init__(self):
+        self.count = self.errors = self.round_trips = self.commands = 0
+        self.bytes_out = self.bytes_in = 0
+        self.total = 0.0
+        self.buckets = [0]*len(BUCKETS)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.commands = {}
+        self.operations = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.commands.clear()
+            self.operations.clear()
+
+    def record_command(self, name, seconds, bytes_out, bytes_in, error=False, round_trip=True):
+        with self._lock:
+            series = self.commands.setdefault(name, _Series())
+            series.observe(seconds)
+            series.errors += error
+            series.round_trips += round_trip
+            series.commands += 1
+            series.bytes_out += bytes_out
+            series.bytes_in += bytes_in
+        op = _current_op.get()
+        if op is not None:
+            op.round_trips += round_trip
+            op.commands += 1
+            op.bytes_out += bytes_out
+            op.bytes_in += bytes_in
+
+    def record_pipeline(self, names, seconds, bytes_out, bytes_in, error=False):
+        with self._lock:
+            series = self.commands.setdefault('PIPELINE', _Series())
+            series.observe(seconds)
+            series.errors += error
+            series.round_trips += 1
+            series.commands += len(names)
+            series.bytes_out += bytes_out
+            series.bytes_in += bytes_in
+            for name in names:
+                self.commands.setdefault(name, _Series()).commands += 1
+        op = _current_op.get()
+        if op is not None:
+            op.round_trips += 1
+            op.commands += len(names)
+            op.bytes_out += bytes_out
+            op.bytes_in += bytes_in
+
+    def record_operation(self, name, seconds, usage, error=False):
+        with self._lock:
+            series = self.operations.setdefault(name, _Series())
+            series.observe(seconds)
+            series.errors += error
+            series.round_trips += usage.round_trips
+            series.commands += usage.commands
+            series.bytes_out += usage.bytes_out
+            series.bytes_in += usage.bytes_in
+
+
+METRICS = Metrics()
+
+
+class TracedPipeline(Pipeline):
+    def execute(self, raise_on_error=True):
+        names = [str(args[0]).upper() for args, _ in self.command_stack]
+        bytes_out = sum(_payload_size(args) for args, _ in self.command_stack)
+        start = time.perf_counter()
+        try:
+            result = super().execute(raise_on_error)
+        except Exception:
+            METRICS.record_pipeline(names, time.perf_counter() - start, bytes_out, 0, error=True)
+            raise
+        METRICS.record_pipeline(names, time.perf_counter() - start, bytes_out, _payload_size(result))
+        return result
+
+
+class TracedRedis(redis.Redis):
+    def execute_command(self, *args, **options):
+        name = str(args[0]).upper()
+        bytes_out = _payload_size(args)
+        start = time.perf_counter()
+        try:
+            result = super().execute_command(*args, **options)
+        except Exception:
+            METRICS.record_command(name, time.perf_counter() - start, bytes_out, 0, error=True)
+            raise
+        METRICS.record_command(name, time.perf_counter() - start, bytes_out, _payload_size(result))
+        return result
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return TracedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def traced_operation(name=None):
+    """Decorador que mede uma operação de alto nível e os round trips que ela gerou."""
+    def decorator(func):
+        op_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Operações aninhadas contam só para a mais externa
+            if not METRICS.enabled or _current_op.get() is not None:
+                return func(*args, **kwargs)
+            usage = _Series()
+            token = _current_op.set(usage)
+            start = time.perf_counter()
+            error = False
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                _current_op.reset(token)
+                METRICS.record_operation(op_name, time.perf_counter() - start, usage, error)
+        return wrapper
+    return decorator
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+def _emit_series(lines, prefix, label, series_map):
+    lines.append(f"# TYPE {prefix}_duration_seconds histogram")
+    for key, s in series_map.items():
+        lbl = f'{label}="{_escape(key)}"'
+        cumulative = 0
+        for bound, n in zip(BUCKETS, s.buckets):
+            cumulative += n
+            lines.append(f'{prefix}_duration_seconds_bucket{{{lbl},le="{bound}"}} {cumulative}')
+        lines.append(f'{prefix}_duration_seconds_bucket{{{lbl},le="+Inf"}} {s.count}')
+        lines.append(f'{prefix}_duration_seconds_sum{{{lbl}}} {s.total:.6f}')
+        lines.append(f'{prefix}_duration_seconds_count{{{lbl}}} {s.count}')
+    for metric, attr in (('errors_total', 'errors'), ('round_trips_total', 'round_trips'),
+                         ('commands_total', 'commands'), ('request_bytes_total', 'bytes_out'),
+                         ('response_bytes_total', 'bytes_in')):
+        lines.append(f"# TYPE {prefix}_{metric} counter")
+        for key, s in series_map.items():
+            lines.append(f'{prefix}_{metric}{{{label}="{_escape(key)}"}} {getattr(s, attr)}')
+
+def export_prometheus():
+    """Métricas atuais no formato de exposição texto do Prometheus."""
+    with METRICS._lock:
+        commands = {k: v for k, v in METRICS.commands.items()}
+        operations = {k: v for k, v in METRICS.operations.items()}
+    lines = []
+    _emit_series(lines, 'redis_command', 'command', commands)
+    _emit_series(lines, 'redis_operation', 'operation', operations)
+    return "\n".join(lines) + "\n"
+
+def start_metrics_server(port=9121, host='0.0.0.0'):
+    """Serve /metrics em uma thread de fundo."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = export_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+def print_summary():
+    """Resumo legível das operações e comandos mais custosos."""
+    with METRICS._lock:
+        operations = sorted(METRICS.operations.items(), key=lambda kv: -kv[1].total)
+        commands = sorted(METRICS.commands.items(), key=lambda kv: -kv[1].total)
+    if operations:
+        print(f"{'Operação':<24} {'chamadas':>9} {'média ms':>9} {'RTT/op':>7}")
+        for name, s in operations[:10]:
+            print(f"{name:<24} {s.count:>9} {s.total/s.count*1000:>9.3f} {s.round_trips/s.count:>7.1f}")
+    if commands:
+        print(f"{'Comando':<24} {'chamadas':>9} {'média ms':>9} {'bytes':>10}")
+        for name, s in commands[:10]:
+            if s.count:
+                print(f"{name:<24} {s.count:>9} {s.total/s.count*1000:>9.3f} {s.bytes_out+s.bytes_in:>10}")
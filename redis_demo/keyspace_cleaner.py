@@ -0,0 +1,82 @@
+"""
+Limpeza de chaves por padrão sem bloquear o servidor.
+
+Percorre o keyspace com SCAN (cursor + dica COUNT) em vez de KEYS e apaga em
+lotes com UNLINK, de modo que a memória é liberada em background pelo Redis.
+Em Redis Cluster (onde o SCAN percorre todos os nós) cada UNLINK só pode
+levar chaves de um mesmo hash slot, então o lote vira um pipeline com um
+UNLINK por slot; fora do cluster é um UNLINK só. Um limite opcional de
+chaves/segundo evita picos de carga em produção.
+
+Uso: python keyspace_cleaner.py 'padrao:*' [...] [--dry-run] [--rate 5000]
+"""
+
+import argparse
+import time
+
+from redis_client import get_redis, group_by_slot, is_cluster
+
+def _print_progress(pattern, matched, dry_run):
+    verb = "encontradas" if dry_run else "processadas"
+    print(f"  … {pattern}: {matched} chaves {verb} até agora")
+
+def clean_patterns(r, patterns, count=1000, batch_size=500, max_keys_per_sec=None,
+                   dry_run=False, progress=_print_progress):
+    """
+    Remove as chaves que casam com cada padrão.
+
+    Retorna {padrão: {'matched': n, 'deleted': n, 'seconds': s}}. Com
+    dry_run=True nada é apagado (deleted fica 0).
+    """
+    report = {}
+    cluster = is_cluster(r)
+    for pattern in patterns:
+        start = time.monotonic()
+        matched = deleted = 0
+        batch = []
+
+        def flush():
+            nonlocal deleted
+            if not dry_run and batch and cluster:
+                pipe = r.pipeline(transaction=False)
+                for keys in group_by_slot(batch).values():
+                    pipe.unlink(*keys)
+                deleted += sum(n for n in pipe.execute() if isinstance(n, int))
+            elif not dry_run and batch:
+                deleted += r.unlink(*batch)
+            batch.clear()
+            if progress:
+                progress(pattern, matched, dry_run)
+            if max_keys_per_sec:
+                # Dorme o necessário para não passar do limite configurado
+                ahead = matched / max_keys_per_sec - (time.monotonic() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        for k in r.scan_iter(match=pattern, count=count):
+            batch.append(k)
+            matched += 1
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        report[pattern] = {'matched': matched, 'deleted': deleted,
+                           'seconds': round(time.monotonic() - start, 3)}
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove chaves por padrão usando SCAN + UNLINK")
+    parser.add_argument('patterns', nargs='+')
+    parser.add_argument('--count', type=int, default=1000, help="dica COUNT do SCAN")
+    parser.add_argument('--batch', type=int, default=500, help="chaves por pipeline de UNLINK")
+    parser.add_argument('--rate', type=float, default=None, help="máximo de chaves por segundo")
+    parser.add_argument('--dry-run', action='store_true', help="só conta, não apaga")
+    args = parser.parse_args()
+    report = clean_patterns(get_redis(), args.patterns, args.count, args.batch,
+                            args.rate, args.dry_run)
+    for pattern, stats in report.items():
+        print(f"{pattern}: {stats['matched']} encontradas, {stats['deleted']} removidas "
+              f"em {stats['seconds']}s")
+
+if __name__ == '__main__':
+    main()
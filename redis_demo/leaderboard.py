@@ -1,53 +1,204 @@
+import atexit
+import threading
 import time
 
+import redis
+from redis.exceptions import NoScriptError
+
+from change_feed import ChangeFeed
+from instrumentation import traced_operation
+from leaderboard_writes import queue_write, write
+from lua_scripts import REGISTRY
 from redis_client import get_redis
+from score_histogram import ScoreHistogram
+from top_cache import TopNCache
+
+# Cache opcional do top-N (ver enable_top_cache)
+_top_cache = None
+
+def enable_top_cache(max_keys=128, ttl=5.0):
+    """Ativa o cache local de get_top_players/display_leaderboard."""
+    global _top_cache
+    if _top_cache is None:
+        _top_cache = TopNCache(max_keys, ttl)
+    return _top_cache
+
+def disable_top_cache():
+    global _top_cache
+    if _top_cache is not None:
+        _top_cache.close()
+        _top_cache = None
+
+def enable_score_histogram(key='leaderboard_demo', reconcile=False, **options):
+    """
+    Passa a manter a distribuição de pontuações de `key` a cada escrita, em
+    qualquer processo (os parâmetros ficam no Redis, ver score_histogram.py).
+    As opções são as de ScoreHistogram (kind, low, width, base, buckets).
+    O histograma é reconstruído a partir do ZSET se ainda não existe no Redis,
+    se as opções mudaram ou com reconcile=True.
+    """
+    return ScoreHistogram(key, **options).enable(reconcile)
+
+def disable_score_histogram(key='leaderboard_demo'):
+    ScoreHistogram(key).disable()
 
+def get_score_histogram(key='leaderboard_demo'):
+    """Histograma ativo para `key` (ativado por qualquer processo), ou None."""
+    return ScoreHistogram.load(key)
+
+def enable_change_feed(key='leaderboard_demo', top_n=10):
+    """
+    Faz as escritas em `key` publicarem deltas do top-N (ver change_feed.py),
+    em qualquer processo. Se `key` mantém um histograma, o mesmo script
+    atualiza os dois.
+    """
+    return ChangeFeed(key, top_n).enable()
+
+def disable_change_feed(key='leaderboard_demo'):
+    ChangeFeed(key).disable()
+
+def get_change_feed(key='leaderboard_demo'):
+    """Feed ativo para `key` (ativado por qualquer processo), ou None."""
+    return ChangeFeed.load(key)
+
+def _invalidate(key):
+    if _top_cache is not None:
+        _top_cache.invalidate(key)
+
+@traced_operation()
 def add_score(player, score, key='leaderboard_demo'):
-    r = get_redis()
-    r.zadd(key, {player: score})
+    write(get_redis(), 'set', key, player, score)
+    _invalidate(key)
     print(f"✅ Pontuação de {player}: {score} pontos")
 
+@traced_operation()
 def increment_score(player, increment=1.0, key='leaderboard_demo'):
-    r = get_redis()
-    new_score = r.zincrby(key, increment, player)
-    if isinstance(new_score, (int, float)):
-        print(f"✅ {player} ganhou {increment} pontos! Total: {new_score}")
-        return new_score
-    return 0
+    new_score = float(write(get_redis(), 'incr', key, player, increment))
+    _invalidate(key)
+    print(f"✅ {player} ganhou {increment} pontos! Total: {new_score}")
+    return new_score
 
-def get_top_players(limit=10, key='leaderboard_demo'):
+def _fetch_top_players(key, limit):
     r = get_redis()
     result = r.zrevrange(key, 0, limit-1, withscores=True)
     return result if isinstance(result, list) else []
 
+@traced_operation()
+def get_top_players(limit=10, key='leaderboard_demo'):
+    if _top_cache is not None:
+        return _top_cache.get(key, limit, _fetch_top_players)
+    return _fetch_top_players(key, limit)
+
+@traced_operation()
 def get_player_rank(player, key='leaderboard_demo'):
     r = get_redis()
-    rank = r.zrevrank(key, player)
-    if rank is not None and isinstance(rank, int):
-        score = r.zscore(key, player)
-        return (rank+1, score)
+    result = REGISTRY.call(r, 'rank_score', [key], [player])
+    if result:
+        rank, score = result
+        return (rank+1, float(score))
     return (None, None)
 
+# None = ainda não testado; ZREVRANK ... WITHSCORE existe a partir do Redis 7.2
+_withscore_supported = None
+
+def _is_unsupported_syntax(error):
+    """Erro de servidor antigo para WITHSCORE (e não, por exemplo, WRONGTYPE)."""
+    message = str(error).lower()
+    return 'wrong number of arguments' in message or 'syntax error' in message
+
+@traced_operation()
+def get_player_ranks(players, key='leaderboard_demo', chunk_size=1000):
+    """
+    Busca posição e pontuação de vários jogadores de uma vez.
+
+    Os comandos são enviados em pipelines de `chunk_size` jogadores para não
+    bloquear o servidor com lotes gigantes. Retorna {jogador: (posição, score)},
+    com (None, None) para jogadores que não estão no ranking.
+    """
+    global _withscore_supported
+    r = get_redis()
+    players = list(dict.fromkeys(players))
+    result = {}
+    for i in range(0, len(players), chunk_size):
+        chunk = players[i:i+chunk_size]
+        if _withscore_supported is not False:
+            pipe = r.pipeline(transaction=False)
+            for player in chunk:
+                pipe.zrevrank(key, player, withscore=True)
+            try:
+                replies = pipe.execute()
+                _withscore_supported = True
+            except redis.ResponseError as e:
+                if not _is_unsupported_syntax(e):
+                    raise
+                _withscore_supported = False
+            else:
+                for player, reply in zip(chunk, replies):
+                    if reply is None:
+                        result[player] = (None, None)
+                    else:
+                        rank, score = reply
+                        result[player] = (rank+1, float(score))
+                continue
+        # Servidores antigos: ZREVRANK + ZSCORE no mesmo pipeline
+        pipe = r.pipeline(transaction=False)
+        for player in chunk:
+            pipe.zrevrank(key, player)
+            pipe.zscore(key, player)
+        replies = pipe.execute()
+        for player, rank, score in zip(chunk, replies[0::2], replies[1::2]):
+            if isinstance(rank, int):
+                result[player] = (rank+1, score)
+            else:
+                result[player] = (None, None)
+    return result
+
+@traced_operation()
 def get_players_around(player, range_size=2, key='leaderboard_demo'):
     r = get_redis()
-    rank = r.zrevrank(key, player)
-    if rank is None or not isinstance(rank, int):
+    result = REGISTRY.call(r, 'neighbors_around', [key], [player, range_size])
+    if not result:
         return []
-    start = max(0, rank-range_size)
-    end = rank+range_size
-    players = r.zrevrange(key, start, end, withscores=True)
-    if isinstance(players, list):
-        return [(start+i+1, p, score) for i, (p, score) in enumerate(players)]
-    return []
+    start, flat = result
+    players = zip(flat[0::2], flat[1::2])
+    return [(start+i+1, p, float(score)) for i, (p, score) in enumerate(players)]
 
+@traced_operation()
+def set_best_score(player, score, key='leaderboard_demo'):
+    """Grava a pontuação só se ela superar a atual. Retorna (atualizou, melhor)."""
+    updated, best = write(get_redis(), 'best', key, player, score)
+    if updated:
+        _invalidate(key)
+    return (bool(updated), float(best))
+
+@traced_operation()
+def add_score_capped(player, score, max_size, key='leaderboard_demo'):
+    """
+    Grava a pontuação e mantém só os `max_size` melhores, atomicamente.
+    Retorna a posição do jogador ou None se ele ficou fora do corte.
+    """
+    removed, rank = write(get_redis(), 'capped', key, player, score, max_size)
+    _invalidate(key)
+    return rank+1 if rank >= 0 else None
+
+@traced_operation()
+def trim_leaderboard(max_size, key='leaderboard_demo'):
+    """Remove todos os jogadores abaixo das `max_size` primeiras posições."""
+    removed = write(get_redis(), 'trim', key, max_size=max_size)
+    if removed:
+        _invalidate(key)
+    return removed
+
+@traced_operation()
 def remove_player(player, key='leaderboard_demo'):
-    r = get_redis()
-    removed = r.zrem(key, player)
-    return isinstance(removed, int) and removed > 0
+    removed = write(get_redis(), 'rem', key, player)
+    _invalidate(key)
+    return bool(removed)
 
+@traced_operation()
 def clear_leaderboard(key='leaderboard_demo'):
-    r = get_redis()
-    r.delete(key)
+    write(get_redis(), 'clear', key)
+    _invalidate(key)
     print("🗑️ Leaderboard limpo!")
 
 def display_leaderboard(title="🏆 LEADERBOARD", key='leaderboard_demo'):
@@ -59,6 +210,181 @@ def display_leaderboard(title="🏆 LEADERBOARD", key='leaderboard_demo'):
     for i, (player, score) in enumerate(players, 1):
         print(f"{i:2d}. {player:<20} {score:>8.0f} pts")
 
+# Falhas em que repetir a escrita pode dar certo
+_TRANSIENT_ERRORS = (redis.ConnectionError, redis.TimeoutError)
+
+class ScoreAggregator:
+    """
+    Escritor write-behind para incrementos de pontuação.
+
+    Soma os incrementos por (chave, jogador) em memória e grava tudo com um
+    único pipeline de escritas quando `max_events` eventos se acumulam ou
+    `max_delay_ms` milissegundos se passam, o que ocorrer primeiro.
+
+    O buffer guarda no máximo `max_pending` pares (chave, jogador), contando
+    os que estão sendo gravados. Com ele cheio (ex.: Redis fora do ar), um
+    incremento para um par novo espera até `max_block` segundos por espaço e
+    então é rejeitado com RuntimeError, sem ter sido registrado.
+
+    Só falhas transitórias (conexão, timeout) devolvem os incrementos ao
+    buffer; erros do servidor (ex.: WRONGTYPE) não melhoram com outra
+    tentativa, então o incremento é descartado e contado em stats['dropped'].
+    """
+
+    def __init__(self, max_events=500, max_delay_ms=50, max_pending=10000, max_block=1.0):
+        self.max_events = max_events
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_pending = max_pending
+        self.max_block = max_block
+        self._r = get_redis()
+        self._pending = {}
+        self._inflight = 0
+        self._events = 0
+        self._first_event_at = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self.stats = {'events': 0, 'coalesced': 0, 'flushed_ops': 0, 'flushes': 0,
+                      'flush_errors': 0, 'rejected': 0, 'dropped': 0}
+        self._thread = threading.Thread(target=self._run, name='score-aggregator', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def increment(self, player, increment=1.0, key='leaderboard_demo'):
+        """Agenda um incremento; nada é enviado ao Redis até o próximo flush."""
+        entry = (key, player)
+        deadline = time.monotonic() + self.max_block
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("ScoreAggregator já foi encerrado")
+                # Somar a um par já pendente não aumenta o buffer
+                if entry in self._pending or len(self._pending) + self._inflight < self.max_pending:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['rejected'] += 1
+                    raise RuntimeError("Buffer do ScoreAggregator cheio; incremento não registrado")
+                self._cond.wait(remaining)
+            if entry in self._pending:
+                self._pending[entry] += increment
+                self.stats['coalesced'] += 1
+            else:
+                self._pending[entry] = increment
+            self._events += 1
+            self.stats['events'] += 1
+            if self._first_event_at is None:
+                self._first_event_at = time.monotonic()
+                self._cond.notify()
+            full = (self._events >= self.max_events
+                    or len(self._pending) + self._inflight >= self.max_pending)
+        if full:
+            # Buffer cheio: quem escreve paga o flush (backpressure). O
+            # incremento já está no buffer, então uma falha aqui não é
+            # repassada: a thread de fundo tenta gravar de novo.
+            try:
+                self.flush()
+            except Exception:
+                self.stats['flush_errors'] += 1
+
+    def flush(self):
+        """Grava imediatamente os incrementos pendentes. Retorna o nº de comandos."""
+        with self._flush_lock:
+            with self._cond:
+                batch = self._pending
+                self._pending = {}
+                self._inflight = len(batch)
+                self._events = 0
+                self._first_event_at = None
+            if not batch:
+                return 0
+            try:
+                return self._write(batch)
+            finally:
+                with self._cond:
+                    self._inflight = 0
+                    # Acorda quem espera espaço no buffer
+                    self._cond.notify_all()
+
+    def _write(self, batch):
+        try:
+            pipe = self._r.pipeline(transaction=False)
+            for (key, player), increment in batch.items():
+                queue_write(pipe, self._r, 'incr', key, player, increment)
+            replies = pipe.execute(raise_on_error=False)
+        except _TRANSIENT_ERRORS:
+            self._requeue(batch)
+            raise
+        # Em cluster o pipeline é dividido por nó e pode falhar em parte:
+        # só os incrementos com falha transitória voltam ao buffer
+        failed, dropped, error = {}, 0, None
+        for (entry, increment), reply in zip(batch.items(), replies):
+            if isinstance(reply, NoScriptError):
+                # O EVALSHA não rodou (cache de scripts perdido): repetir é seguro
+                try:
+                    reply = write(self._r, 'incr', entry[0], entry[1], increment)
+                except redis.RedisError as e:
+                    reply = e
+            if isinstance(reply, _TRANSIENT_ERRORS):
+                failed[entry] = increment
+                error = error or reply
+            elif isinstance(reply, Exception):
+                dropped += 1
+                print(f"❌ Incremento de {entry[1]} em {entry[0]} descartado: {reply}")
+        if failed:
+            self._requeue(failed)
+        for key in {key for key, _ in batch}:
+            _invalidate(key)
+        self.stats['flushed_ops'] += len(batch) - len(failed) - dropped
+        self.stats['dropped'] += dropped
+        self.stats['flushes'] += 1
+        if error is not None:
+            raise error
+        return len(batch)
+
+    def _requeue(self, entries):
+        """Devolve incrementos não gravados ao buffer para não perdê-los."""
+        with self._cond:
+            for entry, increment in entries.items():
+                self._pending[entry] = self._pending.get(entry, 0) + increment
+            if self._first_event_at is None:
+                self._first_event_at = time.monotonic()
+
+    def close(self):
+        """Para a thread de fundo e grava o que estiver pendente."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and self._first_event_at is None:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                remaining = self._first_event_at + self.max_delay - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+            try:
+                self.flush()
+            except Exception as e:
+                self.stats['flush_errors'] += 1
+                print(f"❌ Erro ao gravar incrementos: {e}")
+                time.sleep(self.max_delay)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 def run_leaderboard_demo():
     key = 'leaderboard_demo'
     while True:
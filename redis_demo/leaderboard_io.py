@@ -0,0 +1,145 @@
+"""
+Exportação e importação de leaderboards em streaming (CSV ou NDJSON).
+
+A exportação percorre o ZSET em blocos fixos de posições (ZREVRANGE
+início..início+bloco), então nem o cliente nem o servidor lidam com o
+ranking inteiro de uma vez. A importação lê o arquivo linha a linha e grava
+com ZADD de vários membros por comando, vários comandos por pipeline; a
+memória usada é limitada a `chunk_size * pipeline_depth` jogadores.
+
+O formato é deduzido da extensão (.csv ou .ndjson/.jsonl).
+
+Uso:
+    python leaderboard_io.py export ranking.csv --key leaderboard_demo
+    python leaderboard_io.py import ranking.ndjson --key leaderboard_demo --replace
+"""
+
+import argparse
+import csv
+import json
+import time
+
+import leaderboard
+from redis_client import colocated, get_redis
+
+def _format_for(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+def _print_progress(rows, elapsed):
+    rate = rows/elapsed if elapsed else 0
+    print(f"  … {rows:,} jogadores ({rate:,.0f}/s)")
+
+def iter_leaderboard(key='leaderboard_demo', chunk_size=1000):
+    """Gera (posição, jogador, pontuação) do primeiro ao último, em blocos."""
+    r = get_redis()
+    start = 0
+    while True:
+        chunk = r.zrevrange(key, start, start+chunk_size-1, withscores=True)
+        for i, (player, score) in enumerate(chunk):
+            yield (start+i+1, player, score)
+        if len(chunk) < chunk_size:
+            return
+        start += chunk_size
+
+def export_leaderboard(path, key='leaderboard_demo', fmt=None, chunk_size=1000,
+                       progress=_print_progress, progress_every=100000):
+    """Grava o leaderboard em `path`. Retorna o número de jogadores exportados."""
+    fmt = _format_for(path, fmt)
+    start = time.monotonic()
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f) if fmt == 'csv' else None
+        if writer:
+            writer.writerow(['rank', 'player', 'score'])
+        for rank, player, score in iter_leaderboard(key, chunk_size):
+            if writer:
+                writer.writerow([rank, player, score])
+            else:
+                f.write(json.dumps({'rank': rank, 'player': player, 'score': score}) + "\n")
+            rows += 1
+            if progress and rows % progress_every == 0:
+                progress(rows, time.monotonic() - start)
+    if progress:
+        progress(rows, time.monotonic() - start)
+    return rows
+
+def _read_rows(path, fmt):
+    with open(path, newline='') as f:
+        if fmt == 'csv':
+            for row in csv.DictReader(f):
+                yield row['player'], float(row['score'])
+        else:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    yield row['player'], float(row['score'])
+
+def import_leaderboard(path, key='leaderboard_demo', fmt=None, chunk_size=1000, pipeline_depth=10,
+                       replace=False, progress=_print_progress, progress_every=100000):
+    """
+    Carrega `path` em `key`. Com replace=True a carga vai para uma chave
+    temporária que substitui `key` com RENAME no final, então leitores nunca
+    veem um ranking pela metade. Se `key` mantém um histograma (ativado
+    por qualquer processo com leaderboard.enable_score_histogram), ele é
+    reconstruído no final, e um feed ativo publica um reset.
+    Retorna o número de linhas lidas.
+    """
+    fmt = _format_for(path, fmt)
+    r = get_redis()
+    target = colocated(key, 'import') if replace else key
+    if replace:
+        r.delete(target)
+    pipe = r.pipeline(transaction=False)
+    mapping = {}
+    rows = 0
+    start = time.monotonic()
+    for player, score in _read_rows(path, fmt):
+        mapping[player] = score
+        rows += 1
+        if len(mapping) >= chunk_size:
+            pipe.zadd(target, mapping)
+            mapping = {}
+            if len(pipe) >= pipeline_depth:
+                pipe.execute()
+        if progress and rows % progress_every == 0:
+            progress(rows, time.monotonic() - start)
+    if mapping:
+        pipe.zadd(target, mapping)
+    if len(pipe):
+        pipe.execute()
+    if replace:
+        if r.exists(target):
+            r.rename(target, key)
+        else:
+            r.delete(key)
+    # A carga grava direto no ZSET, por fora dos scripts de escrita
+    hist = leaderboard.get_score_histogram(key)
+    if hist is not None:
+        hist.reconcile()
+    feed = leaderboard.get_change_feed(key)
+    if feed is not None:
+        feed.reset()
+    if progress:
+        progress(rows, time.monotonic() - start)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta/importa leaderboards em CSV ou NDJSON")
+    parser.add_argument('action', choices=['export', 'import'])
+    parser.add_argument('path')
+    parser.add_argument('--key', default='leaderboard_demo')
+    parser.add_argument('--format', choices=['csv', 'ndjson'])
+    parser.add_argument('--chunk', type=int, default=1000, help="jogadores por bloco/ZADD")
+    parser.add_argument('--replace', action='store_true', help="substitui o leaderboard na importação")
+    args = parser.parse_args()
+    start = time.monotonic()
+    if args.action == 'export':
+        rows = export_leaderboard(args.path, args.key, args.format, args.chunk)
+    else:
+        rows = import_leaderboard(args.path, args.key, args.format, args.chunk, replace=args.replace)
+    print(f"✅ {rows:,} jogadores em {time.monotonic()-start:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Escritas no ZSET de um leaderboard junto com os complementos ativos da chave.
+
+O histograma de pontuações (score_histogram.py) e o feed do top-N
+(change_feed.py) são ativados por chave e guardam a configuração no Redis,
+ao lado do ZSET. Todo script que grava no ZSET inclui HOOKS_LUA e consulta
+essa configuração na mesma execução, então qualquer processo que escreve
+pelos módulos do repositório (leaderboard, windowed_leaderboard,
+async_leaderboard, http_service, leaderboard_io) mantém os complementos em
+dia sem precisar tê-los ativado.
+
+Um script que grava no ZSET recebe a chave do ZSET seguida de hook_keys(key)
+e usa as funções de HOOKS_LUA:
+
+    local X = hooks_open(KEYS[1], 2)         -- 2 = índice da 1ª chave dos ganchos
+    local B = hooks_before(X, jogador)
+    ... grava ...
+    hooks_after(X, jogador, B, nova pontuação (string) ou nil se removido)
+
+Pontuações vão e voltam como strings: o tostring do Lua só tem 14 dígitos.
+"""
+
+from change_feed import FEED_LUA, feed_keys
+from lua_scripts import REGISTRY
+from score_histogram import HIST_LUA, hist_keys
+
+HOOKS_LUA = HIST_LUA + FEED_LUA + """
+local function hooks_open(zkey, first)
+    return {zkey = zkey, hist = hist_open(zkey, first),
+            feed = feed_open(zkey, KEYS[first + 4], KEYS[first + 5])}
+end
+local function hooks_before(X, player)
+    return {score = redis.call('ZSCORE', X.zkey, player), rank = feed_rank(X.feed, player)}
+end
+local function hooks_after(X, player, B, new)
+    hist_update(X.hist, player, B.score and tonumber(B.score), new and tonumber(new))
+    feed_after(X.feed, player, B.rank, new)
+end
+local function hooks_trim(X, cap)
+    local removed = hist_trim(X.hist, X.zkey, cap)
+    if removed > 0 then
+        feed_trimmed(X.feed, cap)
+    end
+    return removed
+end
+local function hooks_clear(X)
+    redis.call('DEL', X.zkey)
+    hist_clear(X.hist)
+    feed_reset(X.feed)
+end
+"""
+
+# KEYS: zset + hook_keys | ARGV: modo (set|incr|rem|best|capped|trim|clear),
+# jogador, valor, limite de tamanho (capped/trim)
+REGISTRY.register('leaderboard_write', HOOKS_LUA + """
+local X = hooks_open(KEYS[1], 2)
+local mode, player, value = ARGV[1], ARGV[2], ARGV[3]
+if mode == 'clear' then
+    hooks_clear(X)
+    return 1
+elseif mode == 'trim' then
+    return hooks_trim(X, tonumber(ARGV[4]))
+end
+local B = hooks_before(X, player)
+if mode == 'rem' then
+    if not B.score then
+        return 0
+    end
+    redis.call('ZREM', KEYS[1], player)
+    hooks_after(X, player, B, nil)
+    return 1
+end
+if mode == 'best' and B.score and tonumber(B.score) >= tonumber(value) then
+    return {0, B.score}
+end
+local new = value
+if mode == 'incr' then
+    new = redis.call('ZINCRBY', KEYS[1], value, player)
+else
+    redis.call('ZADD', KEYS[1], value, player)
+end
+hooks_after(X, player, B, new)
+if mode == 'best' then
+    return {1, value}
+elseif mode == 'capped' then
+    local removed = hooks_trim(X, tonumber(ARGV[4]))
+    return {removed, redis.call('ZREVRANK', KEYS[1], player) or -1}
+end
+return new
+""")
+
+def hook_keys(key):
+    """Chaves que os ganchos de `key` usam, logo após a chave do ZSET."""
+    return hist_keys(key) + feed_keys(key)
+
+def _request(mode, key, player, value, max_size):
+    return [key] + hook_keys(key), [mode, player, value, max_size]
+
+def write(r, mode, key, player='', value=0, max_size=0):
+    """Roda uma escrita (ver os modos no script) com os ganchos de `key`."""
+    return REGISTRY.call(r, 'leaderboard_write', *_request(mode, key, player, value, max_size))
+
+def queue_write(pipe, r, mode, key, player='', value=0):
+    """
+    Enfileira uma escrita via EVALSHA. Uma resposta NoScriptError significa
+    que ela não rodou: refaça com write().
+    """
+    REGISTRY.queue_sha(pipe, r, 'leaderboard_write', *_request(mode, key, player, value, 0))
+
+async def write_async(r, mode, key, player='', value=0, max_size=0):
+    """write() para o cliente asyncio."""
+    return await REGISTRY.call_async(r, 'leaderboard_write', *_request(mode, key, player, value, max_size))
+
+async def queue_write_async(pipe, r, mode, key, player='', value=0):
+    """queue_write() para pipelines asyncio."""
+    await REGISTRY.queue_sha_async(pipe, r, 'leaderboard_write', *_request(mode, key, player, value, 0))
@@ -0,0 +1,126 @@
+"""
+Redis Cluster local para testes: N processos redis-server na mesma máquina.
+
+Sobe os nós com cluster-enabled em portas consecutivas, forma o cluster com
+`redis-cli --cluster create` e espera `cluster_state:ok`. Depois basta
+apontar os scripts para qualquer nó:
+
+    python local_cluster.py start --nodes 6 --replicas 1
+    REDIS_CLUSTER=1 REDIS_HOST=127.0.0.1 REDIS_PORT=7000 python main.py
+    python local_cluster.py smoke    # exercita get_redis() e os módulos no cluster
+    python local_cluster.py stop
+
+Requer redis-server e redis-cli (7+, para Pub/Sub sharded) no PATH.
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import time
+
+import redis
+
+def _ports(args):
+    return range(args.base_port, args.base_port + args.nodes)
+
+def _wait(check, timeout, what):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if check():
+                return
+        except redis.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"Tempo esgotado esperando {what}")
+
+def start(args):
+    if args.nodes < 3*(args.replicas+1):
+        raise ValueError("O cluster precisa de pelo menos 3 primários")
+    for port in _ports(args):
+        node_dir = os.path.join(args.dir, str(port))
+        os.makedirs(node_dir, exist_ok=True)
+        subprocess.run(['redis-server', '--port', str(port), '--bind', '127.0.0.1',
+                        '--cluster-enabled', 'yes', '--cluster-config-file', 'nodes.conf',
+                        '--cluster-node-timeout', '5000', '--dir', node_dir,
+                        '--save', '', '--appendonly', 'no', '--daemonize', 'yes',
+                        '--pidfile', os.path.join(node_dir, 'redis.pid'),
+                        '--logfile', os.path.join(node_dir, 'redis.log')], check=True)
+    for port in _ports(args):
+        _wait(lambda: redis.Redis(port=port).ping(), 10, f"o nó {port}")
+    print(f"🚀 {args.nodes} nós no ar, formando o cluster...")
+    subprocess.run(['redis-cli', '--cluster', 'create',
+                    *[f"127.0.0.1:{port}" for port in _ports(args)],
+                    '--cluster-replicas', str(args.replicas), '--cluster-yes'],
+                   check=True, stdout=subprocess.DEVNULL)
+    _wait(lambda: all(redis.Redis(port=port).cluster('info')['cluster_state'] == 'ok'
+                      for port in _ports(args)), 30, "cluster_state:ok")
+    print("✅ Cluster pronto. Use:")
+    print(f"   export REDIS_CLUSTER=1 REDIS_HOST=127.0.0.1 REDIS_PORT={args.base_port}")
+
+def smoke(args):
+    """Roda as operações principais contra o cluster, passando por get_redis()."""
+    # A configuração é lida na importação de redis_client: o ambiente vem antes
+    os.environ.update(REDIS_CLUSTER='1', REDIS_HOST='127.0.0.1', REDIS_PORT=str(args.base_port))
+    import async_chat
+    import leaderboard
+    import publisher
+    from rate_limiter import RateLimiter
+    from redis_client import get_redis, is_cluster
+
+    r = get_redis()
+    assert is_cluster(r) and r.ping()
+    key = 'smoke:leaderboard'
+    leaderboard.clear_leaderboard(key)
+    leaderboard.enable_score_histogram(key, kind='fixed', width=10, buckets=10)
+    leaderboard.enable_change_feed(key)
+    for i in range(20):
+        leaderboard.add_score(f'p{i}', i*5, key)
+    leaderboard.increment_score('p0', 50, key)
+    assert leaderboard.get_player_rank('p0', key) is not None
+    assert sum(n for *_, n in leaderboard.get_score_histogram(key).histogram()) == 20
+
+    limiter = RateLimiter('smoke:ratelimit')
+    assert publisher.publish_limited(limiter, 'smoke:canal', 'ana', 'oi').allowed
+
+    async def roundtrip():
+        received = asyncio.Queue()
+        task = asyncio.create_task(async_chat.listen('smoke:async', received.put))
+        await asyncio.sleep(0.5)
+        await async_chat.publish('smoke:async', 'ana', 'oi')
+        try:
+            return await asyncio.wait_for(received.get(), 5)
+        finally:
+            task.cancel()
+    print(f"📨 {asyncio.run(roundtrip())}")
+    leaderboard.clear_leaderboard(key)
+    print("✅ Smoke test no cluster concluído")
+
+def stop(args):
+    for port in _ports(args):
+        try:
+            redis.Redis(port=port).shutdown(nosave=True)
+        except redis.ConnectionError:
+            pass
+    shutil.rmtree(args.dir, ignore_errors=True)
+    print("🛑 Cluster local encerrado")
+
+def main():
+    parser = argparse.ArgumentParser(description="Sobe/derruba um Redis Cluster local")
+    parser.add_argument('action', choices=['start', 'smoke', 'stop'])
+    parser.add_argument('--nodes', type=int, default=6)
+    parser.add_argument('--replicas', type=int, default=1, help="réplicas por primário")
+    parser.add_argument('--base-port', type=int, default=7000)
+    parser.add_argument('--dir', default='/tmp/redis-demo-cluster', help="dados e logs dos nós")
+    args = parser.parse_args()
+    if args.action == 'start':
+        start(args)
+    elif args.action == 'smoke':
+        smoke(args)
+    else:
+        stop(args)
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
+import threading
 import time
+import uuid
 
-from redis_client import get_redis
+from redis_client import colocated, get_redis, max_block
 
 def acquire_lock(r, lock_key, expire=15):
     return r.set(lock_key, 'locked', nx=True, ex=expire)
@@ -8,9 +10,150 @@ def acquire_lock(r, lock_key, expire=15):
 def release_lock(r, lock_key):
     r.delete(lock_key)
 
+# SET NX PX + fencing token crescente (INCR) na mesma chamada
+_ACQUIRE_LUA = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('INCR', KEYS[2])
+end
+return false
+"""
+
+# Só apaga se o lock ainda for nosso e acorda um dos processos em espera
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1], KEYS[2])
+    redis.call('LPUSH', KEYS[2], 1)
+    redis.call('PEXPIRE', KEYS[2], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+_EXTEND_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+class RedisLock:
+    """
+    Lock distribuído com dono identificado, liberação segura e espera sem polling.
+
+    - Cada instância usa um token único; release() só apaga o lock se ele
+      ainda pertencer a ela (compare-and-delete em Lua).
+    - acquire() devolve um fencing token crescente (`self.fence`), que pode
+      ser repassado ao recurso protegido para rejeitar escritas atrasadas.
+    - Quem espera fica bloqueado em BLPOP na lista `{<lock>}:released`, que
+      recebe um aviso a cada liberação; o timeout do BLPOP é limitado pelo
+      TTL restante, para o caso de o dono morrer sem liberar.
+    - Com auto_renew=True, uma thread watchdog renova o TTL enquanto o lock
+      estiver em uso.
+    """
+
+    def __init__(self, r, lock_key, expire=15, auto_renew=False):
+        self.r = r
+        self.lock_key = lock_key
+        # Usadas nos mesmos scripts que o lock: mesmo slot em cluster
+        self.release_key = colocated(lock_key, 'released')
+        self.fence_key = colocated(lock_key, 'fence')
+        self.expire_ms = int(expire*1000)
+        self.auto_renew = auto_renew
+        self.token = None
+        self.fence = None
+        self.lost = False
+        self._stop = threading.Event()
+        self._watchdog = None
+        self._acquire = r.register_script(_ACQUIRE_LUA)
+        self._release = r.register_script(_RELEASE_LUA)
+        self._extend = r.register_script(_EXTEND_LUA)
+
+    def acquire(self, blocking=True, timeout=None):
+        token = uuid.uuid4().hex
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            fence = self._acquire(keys=[self.lock_key, self.fence_key], args=[token, self.expire_ms])
+            if fence:
+                self.token, self.fence, self.lost = token, int(fence), False
+                if self.auto_renew:
+                    self._start_watchdog()
+                return True
+            if not blocking:
+                return False
+            wait = self.r.pttl(self.lock_key)
+            wait = wait/1000 if isinstance(wait, int) and wait > 0 else 0.05
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            # Abaixo do socket_timeout, senão a leitura do BLPOP estoura antes
+            cap = max_block(self.r)
+            if cap is not None:
+                wait = min(wait, cap)
+            # BLPOP aceita timeout fracionário; 0 significaria esperar para sempre
+            self.r.blpop([self.release_key], timeout=max(wait, 0.01))
+
+    def release(self):
+        if self.token is None:
+            return False
+        self._stop_watchdog()
+        released = self._release(keys=[self.lock_key, self.release_key],
+                                  args=[self.token, self.expire_ms])
+        self.token = None
+        return bool(released)
+
+    def extend(self, expire=None):
+        """Renova o TTL se o lock ainda for nosso. Retorna False se ele foi perdido."""
+        if self.token is None:
+            return False
+        ms = self.expire_ms if expire is None else int(expire*1000)
+        return bool(self._extend(keys=[self.lock_key], args=[self.token, ms]))
+
+    def _start_watchdog(self):
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._renew_loop, name=f'lock-watchdog:{self.lock_key}',
+                                          daemon=True)
+        self._watchdog.start()
+
+    def _stop_watchdog(self):
+        if self._watchdog is not None:
+            self._stop.set()
+            if self._watchdog is not threading.current_thread():
+                self._watchdog.join()
+            self._watchdog = None
+
+    def _renew_loop(self):
+        while not self._stop.wait(self.expire_ms/3000):
+            try:
+                if not self.extend():
+                    self.lost = True
+                    return
+            except Exception as e:
+                print(f'⚠️ Falha ao renovar lock {self.lock_key}: {e}')
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+def _simulated_worker(r, lock_key, n):
+    lock = RedisLock(r, lock_key, expire=2, auto_renew=True)
+    start = time.monotonic()
+    if lock.acquire(timeout=5):
+        print(f'Worker {n}: ✅ lock obtido após {time.monotonic()-start:.2f}s (token {lock.fence})')
+        time.sleep(1)
+        lock.release()
+        print(f'Worker {n}: 🔓 lock liberado')
+    else:
+        print(f'Worker {n}: ❌ desistiu - timeout esperando o lock')
+
 def run_concurrency_demo():
     r = get_redis()
     lock_key = 'demo_lock'
+    lock = RedisLock(r, lock_key)
     
     while True:
         print('\n=== Controle de Concorrência Demo ===')
@@ -22,15 +165,17 @@ def run_concurrency_demo():
         op = input('Escolha: ')
         
         if op == '1':
-            if acquire_lock(r, lock_key):
-                print('✅ Lock adquirido com sucesso!')
+            if lock.acquire(blocking=False):
+                print(f'✅ Lock adquirido com sucesso! (fencing token {lock.fence})')
                 print('💡 O lock expira automaticamente em 15 segundos')
             else:
                 print('❌ Lock já está em uso por outro processo.')
                 
         elif op == '2':
-            release_lock(r, lock_key)
-            print('🔓 Lock liberado.')
+            if lock.release():
+                print('🔓 Lock liberado.')
+            else:
+                print('❌ Este processo não possui o lock (ou ele já expirou).')
             
         elif op == '3':
             if r.get(lock_key):
@@ -43,17 +188,13 @@ def run_concurrency_demo():
                 print('🟢 Lock está livre.')
                 
         elif op == '4':
-            print('\n🎯 Simulando tentativas de adquirir lock...')
-            for i in range(3):
-                print(f'Tentativa {i+1}:', end=' ')
-                if acquire_lock(r, lock_key, expire=2):
-                    print('✅ Sucesso!')
-                    time.sleep(1)
-                    release_lock(r, lock_key)
-                    print('🔓 Lock liberado')
-                else:
-                    print('❌ Falhou - lock em uso')
-                time.sleep(0.5)
+            print('\n🎯 Simulando 3 workers disputando o lock (espera por notificação)...')
+            workers = [threading.Thread(target=_simulated_worker, args=(r, lock_key, i+1))
+                       for i in range(3)]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
                 
         elif op == '5':
             break
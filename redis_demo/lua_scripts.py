@@ -0,0 +1,104 @@
+"""
+Registro de scripts Lua do leaderboard.
+
+Os scripts são carregados uma vez (SCRIPT LOAD, normalmente no início do
+programa via load_all) e chamados por EVALSHA. Se o servidor perdeu o cache
+de scripts (restart, SCRIPT FLUSH, failover), o NOSCRIPT é tratado
+recarregando o script e repetindo a chamada.
+
+Cada script faz em uma única ida e volta, de forma atômica, o que antes
+exigia vários comandos.
+"""
+
+import threading
+
+from redis.exceptions import NoScriptError
+
+
+class ScriptRegistry:
+    def __init__(self):
+        self._sources = {}
+        self._shas = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, source):
+        with self._lock:
+            self._sources[name] = source
+            self._shas.pop(name, None)
+
+    def load_all(self, r):
+        """Carrega todos os scripts registrados no servidor."""
+        for name in list(self._sources):
+            self._load(r, name)
+
+    def call(self, r, name, keys=(), args=()):
+        sha = self._shas.get(name) or self._load(r, name)
+        try:
+            return r.evalsha(sha, len(keys), *keys, *args)
+        except NoScriptError:
+            sha = self._load(r, name)
+            return r.evalsha(sha, len(keys), *keys, *args)
+
+    def queue(self, pipe, name, keys=(), args=()):
+        """
+        Enfileira o script em um pipeline. Usa EVAL com o código completo:
+        um NOSCRIPT no meio de um pipeline não poderia ser repetido com
+        segurança, pois os outros comandos do lote já teriam rodado.
+        """
+        return pipe.eval(self._sources[name], len(keys), *keys, *args)
+
+    def queue_sha(self, pipe, r, name, keys=(), args=()):
+        """
+        Enfileira o script via EVALSHA (carregando-o com `r` se preciso). Só
+        serve para scripts que podem ser repetidos: o chamador deve refazer
+        com call() as respostas que vierem como NoScriptError.
+        """
+        sha = self._shas.get(name) or self._load(r, name)
+        return pipe.evalsha(sha, len(keys), *keys, *args)
+
+    def _load(self, r, name):
+        sha = r.script_load(self._sources[name])
+        self._shas[name] = sha
+        return sha
+
+    # Mesmas operações para os clientes de redis.asyncio
+
+    async def call_async(self, r, name, keys=(), args=()):
+        sha = self._shas.get(name) or await self._load_async(r, name)
+        try:
+            return await r.evalsha(sha, len(keys), *keys, *args)
+        except NoScriptError:
+            sha = await self._load_async(r, name)
+            return await r.evalsha(sha, len(keys), *keys, *args)
+
+    async def queue_sha_async(self, pipe, r, name, keys=(), args=()):
+        sha = self._shas.get(name) or await self._load_async(r, name)
+        return pipe.evalsha(sha, len(keys), *keys, *args)
+
+    async def _load_async(self, r, name):
+        sha = await r.script_load(self._sources[name])
+        self._shas[name] = sha
+        return sha
+
+
+REGISTRY = ScriptRegistry()
+
+# Posição (0-based) e pontuação de um jogador
+REGISTRY.register('rank_score', """
+local rank = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+if not rank then
+    return false
+end
+return {rank, redis.call('ZSCORE', KEYS[1], ARGV[1])}
+""")
+
+# Jogadores ao redor de um jogador: {início, membro1, score1, ...}
+REGISTRY.register('neighbors_around', """
+local rank = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+if not rank then
+    return false
+end
+local range = tonumber(ARGV[2])
+local start = math.max(0, rank - range)
+return {start, redis.call('ZREVRANGE', KEYS[1], start, rank + range, 'WITHSCORES')}
+""")
@@ -11,6 +11,9 @@ try:
     from redis_client import get_redis
     from leaderboard import run_leaderboard_demo
     from lock_control import run_concurrency_demo
+    from keyspace_cleaner import clean_patterns
+    from instrumentation import METRICS, print_summary
+    from lua_scripts import REGISTRY
     import subprocess
 except ImportError as e:
     print(f"Erro ao importar módulos: {e}")
@@ -80,11 +83,41 @@ def show_redis_info():
         else:
             print("Informações não disponíveis")
         print("="*50)
+        show_latency_info(redis)
         
     except Exception as e:
         print(f"Erro ao obter informações: {e}")
 
 
+def show_latency_info(redis):
+    """Exibe SLOWLOG, LATENCY LATEST e as métricas coletadas por este processo."""
+    try:
+        slowlog = redis.slowlog_get(10)
+        print("\n🐢 SLOWLOG (10 mais recentes):")
+        if not slowlog:
+            print("(vazio)")
+        for entry in slowlog:
+            command = entry.get('command', '')
+            if isinstance(command, bytes):
+                command = command.decode(errors='replace')
+            print(f"  {entry.get('duration', 0):>8} µs  {command[:60]}")
+    except Exception as e:
+        print(f"SLOWLOG indisponível: {e}")
+    try:
+        latest = redis.execute_command('LATENCY', 'LATEST')
+        print("\n⏱️ LATENCY LATEST:")
+        if not latest:
+            print("(sem eventos - configure latency-monitor-threshold)")
+        for event, timestamp, last_ms, max_ms, *_ in latest or []:
+            print(f"  {event:<20} último: {last_ms} ms  máximo: {max_ms} ms")
+    except Exception as e:
+        print(f"LATENCY indisponível: {e}")
+    if METRICS.enabled:
+        print("\n📈 MÉTRICAS DESTE PROCESSO:")
+        print_summary()
+    print("="*50)
+
+
 def run_chat_publisher():
     """Executa o publisher do chat em um processo separado."""
     try:
@@ -151,8 +184,8 @@ def show_help():
 
 💾 PRÉ-REQUISITOS:
    • Redis Server rodando em localhost:6379
-   • Python 3.7+ com biblioteca redis-py
-   • Para instalar: pip install redis
+   • Python 3.10+ com biblioteca redis-py
+   • Para instalar: pip install -r requirements.txt
 
 🚀 COMO USAR:
    1. Certifique-se que o Redis está rodando
@@ -172,28 +205,31 @@ def show_help():
 
 
 def clean_redis_demo_data():
-    """Limpa dados de demonstração do Redis."""
+    """Limpa dados de demonstração do Redis (SCAN + UNLINK, sem bloquear o servidor)."""
     try:
         redis = get_redis()
         
         patterns = [
+            "leaderboard_demo",
+            "leaderboard_demo:*",
+            "{leaderboard_demo}:*",
             "demo_leaderboard",
             "game_leaderboard", 
+            "demo_lock*",
+            "{demo_lock*",
+            "chat:stream:*",
             "account:*",
             "inventory:*",
-            "lock:*"
+            "lock:*",
+            "{lock:*"
         ]
         
+        report = clean_patterns(redis, patterns, progress=None)
         total_deleted = 0
-        for pattern in patterns:
-            keys = redis.keys(pattern)
-            if keys and isinstance(keys, list):
-                deleted = redis.delete(*keys)
-                if isinstance(deleted, int):
-                    total_deleted += deleted
-                    print(f"🗑️ Removidas {deleted} chaves do padrão: {pattern}")
-                else:
-                    print(f"🗑️ Removidas chaves do padrão: {pattern}")
+        for pattern, stats in report.items():
+            if stats['deleted']:
+                total_deleted += stats['deleted']
+                print(f"🗑️ Removidas {stats['deleted']} chaves do padrão: {pattern} ({stats['seconds']}s)")
         
         if total_deleted > 0:
             print(f"✅ Total de {total_deleted} chaves removidas")
@@ -221,6 +257,9 @@ def main():
         input("\nPressione Enter para tentar novamente ou Ctrl+C para sair...")
         return main()  # Tenta novamente
     
+    # Carrega os scripts Lua uma vez; as chamadas seguintes usam EVALSHA
+    REGISTRY.load_all(get_redis())
+    
     while True:
         print("\n" + "="*60)
         print("🎯 MENU PRINCIPAL - ESCOLHA UMA DEMONSTRAÇÃO:")
@@ -0,0 +1,207 @@
+"""
+Internação de nomes de jogadores em IDs inteiros compactos.
+
+Os nomes são mapeados para IDs numéricos (hashes `{<ns>}:ids` nome -> id e
+`{<ns>}:names` id -> nome, contador `{<ns>}:next_id`), e os sorted sets guardam
+só os IDs, que o Redis codifica como inteiros. Cada nome é guardado uma única
+vez no namespace, não importa em quantos rankings (janelas, shards, temporadas)
+o jogador apareça.
+
+As leituras traduzem IDs de volta para nomes com um cache LRU local e HMGET
+em lote só para os IDs que faltam. memory_report() compara, com MEMORY USAGE,
+o layout por nome com o layout internado.
+"""
+
+import threading
+from collections import OrderedDict
+
+from instrumentation import traced_operation
+from lua_scripts import REGISTRY
+from redis_client import colocated, get_redis
+
+# Obtém ou cria IDs para todos os nomes em ARGV, atomicamente
+REGISTRY.register('intern_ids', """
+local out = {}
+for i, name in ipairs(ARGV) do
+    local id = redis.call('HGET', KEYS[1], name)
+    if not id then
+        id = redis.call('INCR', KEYS[3])
+        redis.call('HSET', KEYS[1], name, id)
+        redis.call('HSET', KEYS[2], id, name)
+    end
+    out[i] = tonumber(id)
+end
+return out
+""")
+
+
+class _LRU:
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for k in keys:
+                if k in self._data:
+                    self._data.move_to_end(k)
+                    found[k] = self._data[k]
+        return found
+
+    def put_many(self, items):
+        with self._lock:
+            for k, v in items:
+                self._data[k] = v
+                self._data.move_to_end(k)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+
+class PlayerInterner:
+    def __init__(self, namespace='players', cache_size=100000, chunk_size=1000):
+        # Os três são usados juntos no script intern_ids: mesmo slot em cluster
+        self.ids_key = colocated(namespace, 'ids')
+        self.names_key = colocated(namespace, 'names')
+        self.counter_key = colocated(namespace, 'next_id')
+        self.chunk_size = chunk_size
+        self._ids = _LRU(cache_size)
+        self._names = _LRU(cache_size)
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def intern(self, names):
+        """IDs dos nomes (criando os que não existem), na mesma ordem."""
+        names = list(names)
+        known = self._ids.get_many(names)
+        missing = list(dict.fromkeys(n for n in names if n not in known))
+        r = get_redis()
+        for i in range(0, len(missing), self.chunk_size):
+            chunk = missing[i:i+self.chunk_size]
+            ids = REGISTRY.call(r, 'intern_ids', [self.ids_key, self.names_key, self.counter_key], chunk)
+            pairs = list(zip(chunk, ids))
+            known.update(pairs)
+            self._ids.put_many(pairs)
+            self._names.put_many((str(pid), name) for name, pid in pairs)
+        return [known[n] for n in names]
+
+    def lookup(self, names):
+        """Como intern(), mas devolve None para nomes nunca vistos (não cria IDs)."""
+        names = list(names)
+        known = self._ids.get_many(names)
+        missing = [n for n in names if n not in known]
+        if missing:
+            r = get_redis()
+            found = [(n, int(pid)) for n, pid in zip(missing, r.hmget(self.ids_key, missing)) if pid]
+            known.update(found)
+            self._ids.put_many(found)
+        return [known.get(n) for n in names]
+
+    def resolve(self, ids):
+        """Nomes dos IDs, na mesma ordem (None para IDs desconhecidos)."""
+        ids = [str(i) for i in ids]
+        known = self._names.get_many(ids)
+        missing = list(dict.fromkeys(i for i in ids if i not in known))
+        self.stats['hits'] += len(ids) - len(missing)
+        self.stats['misses'] += len(missing)
+        r = get_redis()
+        for i in range(0, len(missing), self.chunk_size):
+            chunk = missing[i:i+self.chunk_size]
+            found = [(pid, name) for pid, name in zip(chunk, r.hmget(self.names_key, chunk)) if name]
+            known.update(found)
+            self._names.put_many(found)
+        return [known.get(i) for i in ids]
+
+
+_interner = None
+
+def get_interner():
+    global _interner
+    if _interner is None:
+        _interner = PlayerInterner()
+    return _interner
+
+
+# Mesma API de leaderboard.py, com o ZSET guardando IDs
+
+@traced_operation('interned.add_score')
+def add_score(player, score, key='leaderboard_ids_demo'):
+    r = get_redis()
+    pid, = get_interner().intern([player])
+    r.zadd(key, {pid: score})
+    print(f"✅ Pontuação de {player}: {score} pontos")
+
+@traced_operation('interned.increment_score')
+def increment_score(player, increment=1.0, key='leaderboard_ids_demo'):
+    r = get_redis()
+    pid, = get_interner().intern([player])
+    new_score = r.zincrby(key, increment, pid)
+    print(f"✅ {player} ganhou {increment} pontos! Total: {new_score}")
+    return new_score
+
+def _with_names(entries):
+    names = get_interner().resolve([pid for pid, _ in entries])
+    return [(name, score) for name, (_, score) in zip(names, entries)]
+
+@traced_operation('interned.get_top_players')
+def get_top_players(limit=10, key='leaderboard_ids_demo'):
+    r = get_redis()
+    return _with_names(r.zrevrange(key, 0, limit-1, withscores=True))
+
+@traced_operation('interned.get_player_rank')
+def get_player_rank(player, key='leaderboard_ids_demo'):
+    pid, = get_interner().lookup([player])
+    if pid is None:
+        return (None, None)
+    result = REGISTRY.call(get_redis(), 'rank_score', [key], [pid])
+    if result:
+        rank, score = result
+        return (rank+1, float(score))
+    return (None, None)
+
+@traced_operation('interned.get_players_around')
+def get_players_around(player, range_size=2, key='leaderboard_ids_demo'):
+    pid, = get_interner().lookup([player])
+    if pid is None:
+        return []
+    result = REGISTRY.call(get_redis(), 'neighbors_around', [key], [pid, range_size])
+    if not result:
+        return []
+    start, flat = result
+    entries = _with_names(list(zip(flat[0::2], (float(s) for s in flat[1::2]))))
+    return [(start+i+1, name, score) for i, (name, score) in enumerate(entries)]
+
+@traced_operation('interned.remove_player')
+def remove_player(player, key='leaderboard_ids_demo'):
+    pid, = get_interner().lookup([player])
+    if pid is None:
+        return False
+    return get_redis().zrem(key, pid) > 0
+
+
+def copy_to_interned(source_key, target_key, chunk_size=1000):
+    """Copia um leaderboard por nome para o layout internado, em blocos."""
+    r = get_redis()
+    interner = get_interner()
+    for start in range(0, r.zcard(source_key), chunk_size):
+        entries = r.zrange(source_key, start, start+chunk_size-1, withscores=True)
+        ids = interner.intern(name for name, _ in entries)
+        r.zadd(target_key, {pid: score for pid, (_, score) in zip(ids, entries)})
+
+def memory_report(plain_key='leaderboard_demo', interned_key='leaderboard_ids_demo'):
+    """Compara, em bytes, o leaderboard por nome com o internado (+ dicionários)."""
+    r = get_redis()
+    interner = get_interner()
+    usage = lambda k: r.memory_usage(k, samples=0) or 0
+    report = {
+        'plain_zset': usage(plain_key),
+        'interned_zset': usage(interned_key),
+        'ids_hash': usage(interner.ids_key),
+        'names_hash': usage(interner.names_key),
+        'members': r.zcard(interned_key),
+    }
+    print(f"📦 ZSET por nome ({plain_key}): {report['plain_zset']:,} bytes")
+    print(f"📦 ZSET por ID ({interned_key}): {report['interned_zset']:,} bytes")
+    print(f"📚 Dicionários nome<->ID (compartilhados): "
+          f"{report['ids_hash'] + report['names_hash']:,} bytes")
+    return report
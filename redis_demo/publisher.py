@@ -1,7 +1,20 @@
+from rate_limiter import RateLimiter, Rule
 from redis_client import get_redis
 
+# Por usuário: rajadas de até 10 mensagens, reposição de 5 por segundo
+USER_RULE = Rule('chat-user', 'bucket', 10, 2.0)
+# Por canal: no máximo 100 mensagens em qualquer janela de 1 segundo
+CHANNEL_RULE = Rule('chat-channel', 'sliding', 100, 1.0)
+
+def publish_limited(limiter, canal, usuario, msg, user_rule=USER_RULE, channel_rule=CHANNEL_RULE):
+    """Aplica os limites e publica em um único EVALSHA."""
+    return limiter.check([(user_rule, usuario), (channel_rule, canal)],
+                         channel=canal, message=f'{usuario}: {msg}')
+
 def main():
-    r = get_redis()
+    # Falha logo se o Redis estiver fora do ar, antes de pedir canal e nome
+    get_redis().ping()
+    limiter = RateLimiter()
     canal = input('Canal para publicar: ')
     usuario = input('Seu nome: ')
     print('Digite mensagens para enviar. Ctrl+C para sair.')
@@ -9,11 +22,11 @@ def main():
         while True:
             msg = input('Mensagem: ')
             if msg.strip():
-                subscribers = r.publish(canal, f'{usuario}: {msg}')
-                if isinstance(subscribers, int):
-                    print(f'📤 Enviado para {subscribers} subscriber(s)')
+                decision = publish_limited(limiter, canal, usuario, msg)
+                if decision.allowed:
+                    print(f'📤 Enviado para {decision.receivers} subscriber(s)')
                 else:
-                    print('📤 Mensagem enviada')
+                    print(f'⏳ Limite "{decision.denied_by}" atingido, tente em {decision.retry_after:.1f}s')
     except KeyboardInterrupt:
         print('\nSaindo do publisher.')
 
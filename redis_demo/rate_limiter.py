@@ -0,0 +1,201 @@
+"""
+Rate limiting atômico no Redis: janela fixa, log deslizante e token bucket.
+
+Cada verificação é um único EVALSHA que avalia todas as regras envolvidas
+(ex.: por usuário e por canal) e só consome cota se todas permitirem. O
+mesmo script pode publicar a mensagem quando ela é aceita, então o
+publisher gasta uma ida e volta por mensagem, com limite e PUBLISH juntos.
+
+Algoritmos (limit = quantidade, window = segundos):
+- 'fixed':   contador que zera `window` segundos após o primeiro uso;
+- 'sliding': log de instantes em um ZSET, conta os últimos `window` segundos;
+- 'bucket':  token bucket com capacidade `limit` e reposição de
+             `limit` tokens a cada `window` segundos.
+
+check_many() verifica vários pedidos em um único pipeline (útil para gateways).
+
+Em Redis Cluster cada chave recebe a hash tag do próprio sujeito (ou de um
+hash dele, se o sujeito tem '}' sem formar uma tag), então um limite por
+usuário continua valendo para o usuário em qualquer canal. Um
+script só acessa chaves de um slot: regras em slots diferentes viram um
+script por slot, executados em sequência, e a verificação deixa de ser
+tudo ou nada (se uma regra posterior negar, a cota já consumida nas
+anteriores não é devolvida). O grupo do slot do canal roda por último e
+publica com SPUBLISH (Pub/Sub sharded), no nó dono do slot do canal.
+"""
+
+import hashlib
+import uuid
+from collections import namedtuple
+
+from redis.crc import key_slot
+from redis.exceptions import NoScriptError
+
+from lua_scripts import REGISTRY
+from redis_client import colocated, get_redis, is_cluster
+
+Rule = namedtuple('Rule', 'name algorithm limit window')
+Decision = namedtuple('Decision', 'allowed denied_by retry_after receivers')
+
+ALGORITHMS = ('fixed', 'sliding', 'bucket')
+
+# KEYS: uma chave por regra | ARGV: nonce, canal ('' = não publica), mensagem,
+# comando (PUBLISH|SPUBLISH), depois (algoritmo, limite, janela_ms, custo) por regra.
+# Retorna {permitido, índice da regra que negou, retry_ms, receptores}
+REGISTRY.register('rate_limit', """
+if redis.replicate_commands then redis.replicate_commands() end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tokens = {}
+local function rule(i)
+    local base = 4 + (i - 1) * 4
+    return ARGV[base + 1], tonumber(ARGV[base + 2]), tonumber(ARGV[base + 3]), tonumber(ARGV[base + 4])
+end
+for i = 1, #KEYS do
+    local algo, limit, window, cost = rule(i)
+    local key = KEYS[i]
+    if algo == 'fixed' then
+        local used = tonumber(redis.call('GET', key) or '0')
+        if used + cost > limit then
+            local ttl = redis.call('PTTL', key)
+            return {0, i, ttl > 0 and ttl or window, 0}
+        end
+    elseif algo == 'sliding' then
+        redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+        if redis.call('ZCARD', key) + cost > limit then
+            local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+            local retry = window
+            if oldest[2] then retry = tonumber(oldest[2]) + window - now end
+            return {0, i, retry, 0}
+        end
+    else
+        local b = redis.call('HMGET', key, 'tokens', 'ts')
+        local available = tonumber(b[1]) or limit
+        local ts = tonumber(b[2]) or now
+        available = math.min(limit, available + (now - ts) * limit / window)
+        if available < cost then
+            return {0, i, math.ceil((cost - available) * window / limit), 0}
+        end
+        tokens[i] = available
+    end
+end
+for i = 1, #KEYS do
+    local algo, limit, window, cost = rule(i)
+    local key = KEYS[i]
+    if algo == 'fixed' then
+        if redis.call('INCRBY', key, cost) == cost then
+            redis.call('PEXPIRE', key, window)
+        end
+    elseif algo == 'sliding' then
+        for c = 1, cost do
+            redis.call('ZADD', key, now, ARGV[1] .. ':' .. i .. ':' .. c)
+        end
+        redis.call('PEXPIRE', key, window)
+    else
+        redis.call('HSET', key, 'tokens', tostring(tokens[i] - cost), 'ts', now)
+        redis.call('PEXPIRE', key, window)
+    end
+end
+local receivers = 0
+if ARGV[2] ~= '' then
+    receivers = redis.call(ARGV[4], ARGV[2], ARGV[3])
+end
+return {1, 0, 0, receivers}
+""")
+
+
+class RateLimiter:
+    def __init__(self, prefix='ratelimit'):
+        self.prefix = prefix
+
+    def _key(self, rule, subject, cluster=False):
+        name = f"{self.prefix}:{rule.algorithm}:{rule.name}:{subject}"
+        if not cluster:
+            return name
+        try:
+            return colocated(str(subject), name)
+        except ValueError:
+            # '}' sem hash tag válida (ex.: usuário 'bob}'): a tag vira um hash do sujeito
+            return f"{{{hashlib.sha1(str(subject).encode()).hexdigest()}}}:{name}"
+
+    def _plan(self, r, checks, cost, channel='', message=''):
+        """
+        checks: lista de (Rule, sujeito). Retorna a lista de etapas
+        (índices das regras, keys, args) e se falta publicar à parte.
+        Fora do cluster é sempre uma etapa só, que também publica.
+        """
+        cluster = is_cluster(r)
+        groups = {} if cluster else {0: []}
+        for i, (rule, subject) in enumerate(checks):
+            if rule.algorithm not in ALGORITHMS:
+                raise ValueError(f"Algoritmo inválido: {rule.algorithm}")
+            key = self._key(rule, subject, cluster)
+            groups.setdefault(key_slot(key.encode()) if cluster else 0, []).append((i, key))
+        # Quem publica é a etapa do slot do canal, e ela roda por último
+        publish_slot = (key_slot(channel.encode()) if cluster else 0) if channel else None
+        order = sorted(groups, key=lambda slot: slot == publish_slot)
+        command = 'SPUBLISH' if cluster else 'PUBLISH'
+        stages = []
+        for slot in order:
+            publish = slot == publish_slot
+            indexes = [i for i, _ in groups[slot]]
+            keys = [key for _, key in groups[slot]]
+            args = [uuid.uuid4().hex, channel if publish else '', message if publish else '', command]
+            for i in indexes:
+                rule = checks[i][0]
+                args += [rule.algorithm, rule.limit, int(rule.window*1000), cost]
+            stages.append((indexes, keys, args))
+        return stages, bool(channel) and publish_slot not in groups
+
+    @staticmethod
+    def _decision(checks, indexes, reply):
+        allowed, denied, retry_ms, receivers = reply
+        return Decision(bool(allowed), checks[indexes[denied-1]][0].name if denied else None,
+                        retry_ms/1000, receivers)
+
+    def check(self, checks, cost=1, channel='', message=''):
+        """
+        Consome `cost` de todas as regras, se todas permitirem (1 RTT). Com
+        `channel`, a mensagem é publicada no mesmo script quando aceita.
+        Em cluster, regras em slots diferentes custam um RTT por slot e
+        não são tudo ou nada (ver o docstring do módulo).
+        """
+        r = get_redis()
+        stages, publish_apart = self._plan(r, checks, cost, channel, message)
+        decision = Decision(True, None, 0, 0)
+        for indexes, keys, args in stages:
+            decision = self._decision(checks, indexes, REGISTRY.call(r, 'rate_limit', keys, args))
+            if not decision.allowed:
+                return decision
+        if publish_apart:
+            decision = decision._replace(receivers=r.spublish(channel, message))
+        return decision
+
+    def check_many(self, requests, cost=1):
+        """
+        Verifica vários pedidos (cada um uma lista de (Rule, sujeito)) em um
+        pipeline. Em cluster, pedidos com regras em vários slots usam um
+        pipeline por etapa, e só seguem os pedidos ainda permitidos.
+        """
+        r = get_redis()
+        plans = [self._plan(r, checks, cost)[0] for checks in requests]
+        decisions = [Decision(True, None, 0, 0)] * len(requests)
+        pending = [n for n in range(len(requests)) if plans[n]]
+        step = 0
+        while pending:
+            pipe = r.pipeline(transaction=False)
+            for n in pending:
+                _, keys, args = plans[n][step]
+                REGISTRY.queue_sha(pipe, r, 'rate_limit', keys, args)
+            replies = pipe.execute(raise_on_error=False)
+            for n, reply in zip(pending, replies):
+                indexes, keys, args = plans[n][step]
+                if isinstance(reply, NoScriptError):
+                    # O script não rodou, então repetir não consome cota duas vezes
+                    reply = REGISTRY.call(r, 'rate_limit', keys, args)
+                elif isinstance(reply, Exception):
+                    raise reply
+                decisions[n] = self._decision(requests[n], indexes, reply)
+            step += 1
+            pending = [n for n in pending if decisions[n].allowed and step < len(plans[n])]
+        return decisions
@@ -1,6 +1,202 @@
+"""
+Fábrica de clientes Redis compartilhada por todos os módulos.
+
+A configuração vem, em ordem de prioridade, de variáveis de ambiente
+`REDIS_<OPÇÃO>` (ex.: REDIS_HOST, REDIS_MAX_CONNECTIONS), de um arquivo JSON
+apontado por REDIS_CONFIG_FILE e dos valores de DEFAULTS. get_redis()
+devolve sempre o mesmo cliente (e pool) para a mesma configuração.
+
+Com `trace` (REDIS_TRACE=1) os clientes são instrumentados: veja
+instrumentation.py.
+
+Com `unix_socket_path` a conexão usa socket Unix (menor latência quando o
+Redis roda na mesma máquina). Com `blocking_pool` as threads esperam até
+`pool_timeout` segundos por uma conexão livre em vez de falhar quando o
+pool chega a `max_connections`.
+
+Com `cluster` (REDIS_CLUSTER=1) o cliente é um RedisCluster que descobre os
+nós a partir de host:port e roteia cada comando pelo hash slot da chave.
+Chaves usadas juntas em scripts Lua, RENAME ou ZUNIONSTORE precisam estar no
+mesmo slot: colocated() gera nomes auxiliares com a hash tag da chave
+principal, e group_by_slot() separa lotes de chaves por slot.
+"""
+
+import json
+import os
+import threading
+
 import redis
+from redis.backoff import ExponentialBackoff
+from redis.cluster import RedisCluster
+from redis.crc import key_slot
+from redis.retry import Retry
+
+from instrumentation import METRICS, TracedRedis
+
+DEFAULTS = {
+    'host': 'redis-demo',
+    'port': 6379,
+    'unix_socket_path': '',
+    'db': 0,
+    'password': '',
+    'max_connections': 50,
+    'socket_timeout': 5.0,
+    'socket_connect_timeout': 2.0,
+    'socket_keepalive': True,
+    'health_check_interval': 30,
+    'retries': 3,
+    'backoff_base': 0.05,
+    'backoff_cap': 1.0,
+    'protocol': 2,
+    'blocking_pool': False,
+    'pool_timeout': 5.0,
+    'trace': False,
+    'cluster': False,
+}
+
+def _coerce(value, default):
+    if isinstance(default, bool):
+        return str(value).strip().lower() in ('1', 'true', 'yes', 'sim', 'on')
+    return type(default)(value)
+
+def load_config(path=None, env=None, **overrides):
+    """Monta a configuração: DEFAULTS < arquivo JSON < ambiente < overrides."""
+    env = os.environ if env is None else env
+    config = dict(DEFAULTS)
+    path = path or env.get('REDIS_CONFIG_FILE')
+    if path:
+        with open(path) as f:
+            config.update(json.load(f))
+    for name, default in DEFAULTS.items():
+        value = env.get(f"REDIS_{name.upper()}")
+        if value is not None and value != '':
+            config[name] = _coerce(value, default)
+    config.update(overrides)
+    unknown = set(config) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Opções de Redis desconhecidas: {', '.join(sorted(unknown))}")
+    return config
+
+def connection_kwargs(config):
+    """Argumentos de conexão comuns aos clientes síncrono e assíncrono."""
+    kwargs = {
+        'db': config['db'],
+        'password': config['password'] or None,
+        'socket_timeout': config['socket_timeout'],
+        'socket_connect_timeout': config['socket_connect_timeout'],
+        'health_check_interval': config['health_check_interval'],
+        'protocol': config['protocol'],
+        'decode_responses': True,
+    }
+    if config['unix_socket_path']:
+        kwargs['path'] = config['unix_socket_path']
+    else:
+        kwargs.update(host=config['host'], port=config['port'],
+                      socket_keepalive=config['socket_keepalive'])
+    return kwargs
+
+def _retry(config):
+    # Só falhas de conexão são repetidas: após um timeout de leitura o comando
+    # pode já ter rodado no servidor, e reenviar ZINCRBY/INCR/EVALSHA o aplicaria duas vezes
+    return Retry(ExponentialBackoff(cap=config['backoff_cap'], base=config['backoff_base']),
+                 config['retries'], supported_errors=(redis.ConnectionError,))
+
+def create_pool(config):
+    kwargs = connection_kwargs(config)
+    kwargs['retry'] = _retry(config)
+    if config['unix_socket_path']:
+        kwargs['connection_class'] = redis.UnixDomainSocketConnection
+    if config['blocking_pool']:
+        return redis.BlockingConnectionPool(max_connections=config['max_connections'],
+                                            timeout=config['pool_timeout'], **kwargs)
+    return redis.ConnectionPool(max_connections=config['max_connections'], **kwargs)
+
+class _Cluster(RedisCluster):
+    # Como no cliente simples, timeout de leitura não é repetido (o comando pode ter rodado)
+    ERRORS_ALLOW_RETRY = tuple(e for e in RedisCluster.ERRORS_ALLOW_RETRY if e is not redis.TimeoutError)
+
+def create_cluster(config):
+    """Cliente de Redis Cluster; `max_connections` vale por nó."""
+    if config['unix_socket_path'] or config['db'] or config['trace']:
+        raise ValueError("Cluster não suporta unix_socket_path, db diferente de 0 nem trace")
+    kwargs = connection_kwargs(config)
+    del kwargs['db']
+    return _Cluster(max_connections=config['max_connections'], retry=_retry(config), **kwargs)
+
+def create_client(config, pool=None):
+    if config['cluster']:
+        return create_cluster(config)
+    if config['trace']:
+        METRICS.enabled = True
+        return TracedRedis(connection_pool=pool or create_pool(config))
+    return redis.Redis(connection_pool=pool or create_pool(config))
+
+def _config_key(config):
+    return tuple(sorted(config.items()))
+
+def is_cluster(r):
+    return isinstance(r, RedisCluster)
+
+# Folga entre a espera de um comando bloqueante e o socket_timeout do cliente
+BLOCK_MARGIN = 1.0
+
+def max_block(r):
+    """
+    Maior espera (s) segura para BLPOP/XREADGROUP BLOCK em `r`: o redis-py não
+    estende o socket_timeout para comandos bloqueantes. None = sem limite.
+    """
+    if is_cluster(r):
+        kwargs = r.nodes_manager.connection_kwargs
+    else:
+        kwargs = r.connection_pool.connection_kwargs
+    timeout = kwargs.get('socket_timeout')
+    if timeout is None:
+        return None
+    return max(timeout - BLOCK_MARGIN, timeout/2)
+
+def _hash_tag(key):
+    """Parte da chave usada no cálculo do slot (a hash tag, se houver)."""
+    start = key.find('{')
+    if start != -1:
+        end = key.find('}', start+1)
+        if end > start+1:
+            return key[start+1:end]
+    return None
+
+def colocated(key, suffix):
+    """
+    Nome `key:suffix` que cai no mesmo slot de `key`: se `key` não tem hash
+    tag, ela vira a tag (`{key}:suffix` tem o mesmo slot que `key`).
+    """
+    if _hash_tag(key) is not None:
+        return f"{key}:{suffix}"
+    if '}' in key:
+        raise ValueError(f"Chave sem hash tag válida não pode conter '}}': {key}")
+    return f"{{{key}}}:{suffix}"
+
+def group_by_slot(keys):
+    """Agrupa chaves por hash slot: {slot: [chaves]} (ordem preservada)."""
+    groups = {}
+    for k in keys:
+        groups.setdefault(key_slot(k.encode() if isinstance(k, str) else k), []).append(k)
+    return groups
+
+CONFIG = load_config()
+# Em cluster cada nó tem o próprio pool, criado pelo RedisCluster
+POOL = None if CONFIG['cluster'] else create_pool(CONFIG)
 
-POOL = redis.ConnectionPool(host='redis-demo', port=6379, decode_responses=True)
+# O RedisCluster conecta ao ser criado; em cluster o cliente nasce no primeiro get_redis()
+_clients = {} if CONFIG['cluster'] else {_config_key(CONFIG): create_client(CONFIG, POOL)}
+_clients_lock = threading.Lock()
 
-def get_redis():
-    return redis.Redis(connection_pool=POOL)
\ No newline at end of file
+def get_redis(config=None):
+    """Cliente compartilhado para `config` (ou para a configuração padrão)."""
+    config = config or CONFIG
+    key = _config_key(config)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = create_client(config)
+    return client
@@ -0,0 +1,311 @@
+"""
+Distribuição de pontuações mantida incrementalmente ao lado do leaderboard.
+
+O hash `{<key>}:hist` (bucket -> quantidade de jogadores, no mesmo slot do
+ZSET em cluster) é atualizado pelo mesmo script Lua que grava no ZSET.
+Percentis e histogramas leem só o hash, cujo tamanho é fixo (o número de
+buckets), em vez de varrer o ranking.
+
+Os parâmetros dos buckets ficam no Redis (`{<key>}:hist:params`), não no
+processo: todo script que grava no ZSET (ver leaderboard_writes.py) os
+consulta e atualiza o hash, seja qual for o processo que escreve. Escritas
+feitas com comandos soltos (ZADD direto, redis-cli) não passam por ele;
+depois delas, rode reconcile().
+
+Buckets:
+- 'fixed': largura constante `width` a partir de `low`;
+- 'log':   bucket 0 para pontuações < 1, depois [base^(b-1), base^b).
+Valores fora da faixa caem no primeiro/último bucket.
+
+reconcile() reconstrói o hash a partir do ZSET em blocos, sem bloquear o
+servidor: um cursor (pontuação, membro) marca até onde a varredura chegou
+e, enquanto ela roda, as escritas também corrigem a reconstrução na parte
+já varrida. No fim ela substitui o hash atomicamente. Os contadores nunca
+ficam negativos.
+"""
+
+import math
+
+from lua_scripts import REGISTRY
+from redis_client import colocated, get_redis
+
+# Uma reconstrução abandonada (processo morto) expira sozinha
+REBUILD_TTL = 600
+
+def hist_keys(key):
+    """Chaves do histograma de `key`, na ordem esperada por hist_open: hash, params, rebuild, cursor."""
+    return [colocated(key, 'hist'), colocated(key, 'hist:params'),
+            colocated(key, 'hist:rebuild'), colocated(key, 'hist:scan')]
+
+# Funções Lua compartilhadas pelos scripts que gravam no ZSET (ver
+# leaderboard_writes.py). hist_open devolve nil se `key` não tem histograma;
+# as demais aceitam esse nil e não fazem nada. Pontuações são números ou
+# nil quando o jogador não existe antes/depois da escrita.
+HIST_LUA = """
+local function bytes_after(a, b)
+    -- Ordem do Redis para membros empatados (o `>` do Lua usa o locale)
+    for i = 1, math.min(#a, #b) do
+        local x, y = a:byte(i), b:byte(i)
+        if x ~= y then return x > y end
+    end
+    return #a > #b
+end
+local function hist_open(zkey, first)
+    local hkey, pkey, rkey, skey = KEYS[first], KEYS[first + 1], KEYS[first + 2], KEYS[first + 3]
+    local p = redis.call('HMGET', pkey, 'kind', 'p1', 'p2', 'n')
+    if not p[1] then
+        return nil
+    end
+    local H = {zkey = zkey, hkey = hkey, rkey = rkey, skey = skey,
+               P = {p[1], tonumber(p[2]), tonumber(p[3]), tonumber(p[4])}}
+    local c = redis.call('HMGET', skey, 'started', 'score', 'member')
+    if c[1] then
+        H.scan = {raw = c[2], score = c[2] and tonumber(c[2]), member = c[3]}
+    end
+    return H
+end
+local function hist_bucket(s, P)
+    local b
+    if P[1] == 'log' then
+        if s < 1 then
+            b = 0
+        else
+            b = math.floor(math.log(s) / math.log(P[2])) + 1
+        end
+    else
+        b = math.floor((s - P[2]) / P[3])
+    end
+    if b < 0 then b = 0 elseif b >= P[4] then b = P[4] - 1 end
+    return b
+end
+local function hist_dec(hkey, field)
+    if tonumber(redis.call('HGET', hkey, field) or '0') > 0 then
+        redis.call('HINCRBY', hkey, field, -1)
+    end
+end
+local function hist_apply(hkey, P, old, new)
+    local ob = old and hist_bucket(old, P)
+    local nb = new and hist_bucket(new, P)
+    if ob == nb then
+        return
+    end
+    if ob then
+        hist_dec(hkey, ob)
+        if not nb then hist_dec(hkey, 'total') end
+    end
+    if nb then
+        redis.call('HINCRBY', hkey, nb, 1)
+        if not ob then redis.call('HINCRBY', hkey, 'total', 1) end
+    end
+end
+local function hist_scanned(scan, s, member)
+    -- (s, member) já passou pelo cursor da reconstrução?
+    if not scan.score then
+        return false
+    end
+    return s < scan.score or (s == scan.score and not bytes_after(member, scan.member))
+end
+local function hist_update(H, member, old, new)
+    if not H then
+        return
+    end
+    hist_apply(H.hkey, H.P, old, new)
+    if H.scan then
+        local so = old and hist_scanned(H.scan, old, member) and old or nil
+        local sn = new and hist_scanned(H.scan, new, member) and new or nil
+        hist_apply(H.rkey, H.P, so, sn)
+    end
+end
+local function hist_trim(H, zkey, cap)
+    local size = redis.call('ZCARD', zkey)
+    if size <= cap then
+        return 0
+    end
+    if H then
+        local gone = redis.call('ZRANGE', zkey, 0, size - cap - 1, 'WITHSCORES')
+        for i = 2, #gone, 2 do
+            hist_update(H, gone[i - 1], tonumber(gone[i]), nil)
+        end
+    end
+    return redis.call('ZREMRANGEBYRANK', zkey, 0, size - cap - 1)
+end
+local function hist_clear(H)
+    if H then
+        redis.call('DEL', H.hkey, H.rkey, H.skey)
+    end
+end
+"""
+
+# Um passo de reconcile(): soma o próximo bloco do ZSET (após o cursor) na
+# reconstrução. KEYS: zset + hist_keys | ARGV: tamanho do bloco, TTL.
+# Retorna 1 quando terminou (hash trocado), 0 se falta, -1 se foi cancelada.
+REGISTRY.register('hist_rebuild_step', HIST_LUA + """
+local H = hist_open(KEYS[1], 2)
+if not H or not H.scan then
+    return -1
+end
+local start = 0
+if H.scan.score then
+    -- Posição logo após o cursor: busca binária entre os empatados
+    local lo = redis.call('ZCOUNT', KEYS[1], '-inf', '(' .. H.scan.raw)
+    local hi = lo + redis.call('ZCOUNT', KEYS[1], H.scan.raw, H.scan.raw)
+    while lo < hi do
+        local mid = math.floor((lo + hi) / 2)
+        if bytes_after(redis.call('ZRANGE', KEYS[1], mid, mid)[1], H.scan.member) then
+            hi = mid
+        else
+            lo = mid + 1
+        end
+    end
+    start = lo
+end
+local n = tonumber(ARGV[1])
+local chunk = redis.call('ZRANGE', KEYS[1], start, start + n - 1, 'WITHSCORES')
+for i = 2, #chunk, 2 do
+    hist_apply(H.rkey, H.P, nil, tonumber(chunk[i]))
+end
+if #chunk < 2 * n then
+    if redis.call('EXISTS', H.rkey) == 1 then
+        redis.call('PERSIST', H.rkey)
+        redis.call('RENAME', H.rkey, H.hkey)
+    else
+        redis.call('DEL', H.hkey)
+    end
+    redis.call('DEL', H.skey)
+    return 1
+end
+redis.call('HSET', H.skey, 'score', chunk[#chunk], 'member', chunk[#chunk - 1])
+redis.call('EXPIRE', H.skey, ARGV[2])
+redis.call('EXPIRE', H.rkey, ARGV[2])
+return 0
+""")
+
+
+class ScoreHistogram:
+    def __init__(self, key='leaderboard_demo', kind='log', low=0.0, width=100.0, base=2.0, buckets=64):
+        if kind not in ('fixed', 'log'):
+            raise ValueError(f"Tipo de bucket inválido: {kind}")
+        self.key = key
+        self.hist_key, self.params_key, self.rebuild_key, self.scan_key = hist_keys(key)
+        self.kind = kind
+        self.low = low
+        self.width = width
+        self.base = base
+        self.buckets = buckets
+
+    @classmethod
+    def load(cls, key='leaderboard_demo'):
+        """Histograma ativo para `key` com os parâmetros guardados no Redis, ou None."""
+        params = get_redis().hgetall(colocated(key, 'hist:params'))
+        if not params:
+            return None
+        if params['kind'] == 'log':
+            return cls(key, 'log', base=float(params['p1']), buckets=int(params['n']))
+        return cls(key, 'fixed', low=float(params['p1']), width=float(params['p2']),
+                   buckets=int(params['n']))
+
+    def lua_params(self):
+        """Tipo e parâmetros dos buckets, como HIST_LUA os lê de `params_key`."""
+        if self.kind == 'log':
+            return {'kind': self.kind, 'p1': self.base, 'p2': 0, 'n': self.buckets}
+        return {'kind': self.kind, 'p1': self.low, 'p2': self.width, 'n': self.buckets}
+
+    def enable(self, reconcile=False):
+        """
+        Grava os parâmetros no Redis, o que liga a manutenção do hash em todo
+        script de escrita. Reconstrói o hash se ele ainda não existe, se os
+        parâmetros mudaram ou com reconcile=True.
+        """
+        r = get_redis()
+        params = {k: str(v) for k, v in self.lua_params().items()}
+        pipe = r.pipeline()
+        pipe.hgetall(self.params_key)
+        pipe.exists(self.hist_key)
+        pipe.hset(self.params_key, mapping=params)
+        old, exists, _ = pipe.execute()
+        if reconcile or not exists or old != params:
+            self.reconcile()
+        return self
+
+    def disable(self):
+        """Desliga o histograma de `key` para todos os processos e apaga o hash."""
+        get_redis().delete(self.params_key, self.hist_key, self.rebuild_key, self.scan_key)
+
+    def bucket_of(self, score):
+        if self.kind == 'log':
+            b = 0 if score < 1 else math.floor(math.log(score)/math.log(self.base)) + 1
+        else:
+            b = math.floor((score - self.low)/self.width)
+        return min(max(b, 0), self.buckets-1)
+
+    def bounds(self, b):
+        """Faixa [mín, máx) de pontuações do bucket `b`."""
+        if self.kind == 'log':
+            low = 0.0 if b == 0 else self.base**(b-1)
+            return (low, self.base**b)
+        return (self.low + b*self.width, self.low + (b+1)*self.width)
+
+    # Consultas: só leem o hash de tamanho fixo
+
+    def _counts(self, raw):
+        counts = [0]*self.buckets
+        for field, n in raw.items():
+            if field != 'total':
+                counts[int(field)] = int(n)
+        return counts, int(raw.get('total', 0))
+
+    def histogram(self):
+        """Lista de (mín, máx, quantidade) para os buckets não vazios."""
+        counts, _ = self._counts(get_redis().hgetall(self.hist_key))
+        return [(*self.bounds(b), n) for b, n in enumerate(counts) if n]
+
+    def top_percent(self, player):
+        """
+        Em que "top X%" o jogador está (ex.: 3.0 = top 3%), estimado pelo
+        histograma com interpolação linear dentro do bucket. None se ele não existe.
+        """
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.zscore(self.key, player)
+        pipe.hgetall(self.hist_key)
+        score, raw = pipe.execute()
+        if score is None:
+            return None
+        counts, total = self._counts(raw)
+        if not total:
+            return None
+        b = self.bucket_of(score)
+        low, high = self.bounds(b)
+        above = sum(counts[b+1:])
+        fraction = 0.5 if high == low else min(max((high - score)/(high - low), 0.0), 1.0)
+        return round((above + counts[b]*fraction)/total*100, 2)
+
+    def score_at_percentile(self, p):
+        """Pontuação aproximada abaixo da qual estão `p`% dos jogadores."""
+        counts, total = self._counts(get_redis().hgetall(self.hist_key))
+        if not total:
+            return None
+        target = total*p/100
+        seen = 0
+        for b, n in enumerate(counts):
+            if n and seen + n >= target:
+                low, high = self.bounds(b)
+                return low + (high - low)*(target - seen)/n
+            seen += n
+        return self.bounds(self.buckets-1)[1]
+
+    def reconcile(self, chunk_size=10000):
+        """
+        Reconstrói o histograma a partir do ZSET, `chunk_size` jogadores por
+        script, e troca o hash no fim. Escritas concorrentes continuam valendo
+        (ver o docstring do módulo). Retorna o total de jogadores.
+        """
+        r = get_redis()
+        pipe = r.pipeline()
+        pipe.delete(self.rebuild_key, self.scan_key)
+        pipe.hset(self.scan_key, 'started', 1)
+        pipe.expire(self.scan_key, REBUILD_TTL)
+        pipe.execute()
+        keys = [self.key] + hist_keys(self.key)
+        while REGISTRY.call(r, 'hist_rebuild_step', keys, [chunk_size, REBUILD_TTL]) == 0:
+            pass
+        return int(r.hget(self.hist_key, 'total') or 0)
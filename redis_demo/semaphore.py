@@ -0,0 +1,185 @@
+"""
+Semáforo distribuído com N permissões e lock justo (FIFO), sobre sorted sets.
+
+Chaves usadas para um semáforo `name` (todas com a hash tag `{name}`, então
+ficam no mesmo slot em cluster):
+- `{name}:holders`  ZSET  id -> instante (ms) em que a permissão expira
+- `{name}:queue`    ZSET  id -> senha de chegada (ordem FIFO)
+- `{name}:waiters`  ZSET  id -> instante em que o waiter é considerado morto
+- `{name}:ticket`   contador de senhas
+- `{name}:wake:<id>` lista onde cada waiter fica bloqueado em BLPOP
+
+Todas as transições são scripts Lua e usam o relógio do servidor (TIME),
+então clientes com relógios diferentes não interferem nas expirações.
+Holders que morrem expiram após `expire` segundos; waiters que param de
+renovar a presença na fila saem após `wait_expire` segundos.
+"""
+
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from redis_client import colocated, max_block
+
+_PRELUDE = """
+if redis.replicate_commands then redis.replicate_commands() end
+local t = redis.call('TIME')
+local now = tonumber(t[1])*1000 + math.floor(tonumber(t[2])/1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+local stale = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now)
+for _, id in ipairs(stale) do
+    redis.call('ZREM', KEYS[3], id)
+    redis.call('ZREM', KEYS[2], id)
+end
+local function wake_next(prefix, ttl)
+    local free = tonumber(ARGV[2]) - redis.call('ZCARD', KEYS[1])
+    if free > 0 then
+        for _, id in ipairs(redis.call('ZRANGE', KEYS[2], 0, free-1)) do
+            redis.call('LPUSH', prefix .. id, 1)
+            redis.call('PEXPIRE', prefix .. id, ttl)
+        end
+    end
+end
+"""
+
+# KEYS: holders, queue, waiters, ticket | ARGV: id, limit, hold_ms, wait_ms, wake_prefix
+# Retorna {1, 0} se adquiriu ou {0, ms até a próxima expiração de holder}
+_ACQUIRE_LUA = _PRELUDE + """
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return {1, 0}
+end
+if not redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+    redis.call('ZADD', KEYS[2], redis.call('INCR', KEYS[4]), ARGV[1])
+end
+local free = tonumber(ARGV[2]) - redis.call('ZCARD', KEYS[1])
+if free > 0 and redis.call('ZRANK', KEYS[2], ARGV[1]) < free then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[1])
+    return {1, 0}
+end
+redis.call('ZADD', KEYS[3], now + tonumber(ARGV[4]), ARGV[1])
+local first = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+local wait = tonumber(ARGV[4])
+if first[2] then
+    wait = math.min(wait, tonumber(first[2]) - now)
+end
+return {0, wait}
+"""
+
+# KEYS: holders, queue, waiters | ARGV: id, limit, wake_ttl_ms, wake_prefix
+# Libera a permissão (ou desiste da fila) e acorda quem passou a ter vez
+_RELEASE_LUA = _PRELUDE + """
+local removed = redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+wake_next(ARGV[4], ARGV[3])
+return removed
+"""
+
+# KEYS: holders, queue, waiters | ARGV: id, limit, hold_ms
+_REFRESH_LUA = _PRELUDE + """
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[1])
+    return 1
+end
+return 0
+"""
+
+
+class Semaphore:
+    """
+    Semáforo contador distribuído e justo: as permissões são entregues na
+    ordem de chegada. acquire() devolve um id de permissão (ou None em
+    timeout), que deve ser passado para release().
+    """
+
+    def __init__(self, r, name, limit, expire=15, wait_expire=10, metrics_window=1000):
+        self.r = r
+        self.name = name
+        self.limit = limit
+        self.expire_ms = int(expire*1000)
+        self.wait_expire_ms = int(wait_expire*1000)
+        self._keys = [colocated(name, part) for part in ('holders', 'queue', 'waiters', 'ticket')]
+        self._wake_prefix = colocated(name, 'wake:')
+        self._acquire = r.register_script(_ACQUIRE_LUA)
+        self._release = r.register_script(_RELEASE_LUA)
+        self._refresh = r.register_script(_REFRESH_LUA)
+        self._stats_lock = threading.Lock()
+        self.wait_times = deque(maxlen=metrics_window)
+        self.stats = {'acquired': 0, 'timeouts': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+
+    def acquire(self, blocking=True, timeout=None):
+        permit = uuid.uuid4().hex
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        wake_key = self._wake_prefix + permit
+        while True:
+            acquired, wait_ms = self._acquire(
+                keys=self._keys,
+                args=[permit, self.limit, self.expire_ms, self.wait_expire_ms, self._wake_prefix])
+            if acquired:
+                self._record(time.monotonic() - start, True)
+                self.r.delete(wake_key)
+                return permit
+            # Renova a presença na fila antes que o waiter seja dado como morto
+            wait = min(wait_ms, self.wait_expire_ms/2) / 1000
+            if blocking and deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+            if not blocking or wait <= 0:
+                self._release(keys=self._keys[:3],
+                              args=[permit, self.limit, self.wait_expire_ms, self._wake_prefix])
+                self.r.delete(wake_key)
+                self._record(time.monotonic() - start, False)
+                return None
+            # Abaixo do socket_timeout, senão a leitura do BLPOP estoura antes
+            cap = max_block(self.r)
+            if cap is not None:
+                wait = min(wait, cap)
+            self.r.blpop([wake_key], timeout=max(wait, 0.01))
+
+    def release(self, permit):
+        released = self._release(keys=self._keys[:3],
+                                 args=[permit, self.limit, self.wait_expire_ms, self._wake_prefix])
+        return bool(released)
+
+    def refresh(self, permit):
+        """Renova o prazo da permissão. Retorna False se ela já expirou."""
+        return bool(self._refresh(keys=self._keys[:3], args=[permit, self.limit, self.expire_ms]))
+
+    def holders(self):
+        return self.r.zcard(self._keys[0])
+
+    @contextmanager
+    def hold(self, timeout=None):
+        permit = self.acquire(timeout=timeout)
+        if permit is None:
+            raise TimeoutError(f"Timeout esperando permissão de {self.name}")
+        try:
+            yield permit
+        finally:
+            self.release(permit)
+
+    def wait_percentile(self, p):
+        """Percentil `p` (0-100) dos últimos tempos de espera, em segundos."""
+        with self._stats_lock:
+            waits = sorted(self.wait_times)
+        if not waits:
+            return 0.0
+        return waits[min(len(waits)-1, int(len(waits)*p/100))]
+
+    def _record(self, waited, acquired):
+        with self._stats_lock:
+            self.wait_times.append(waited)
+            self.stats['acquired' if acquired else 'timeouts'] += 1
+            self.stats['total_wait'] += waited
+            self.stats['max_wait'] = max(self.stats['max_wait'], waited)
+
+
+class FairLock(Semaphore):
+    """Lock exclusivo com fila FIFO: semáforo de uma permissão."""
+
+    def __init__(self, r, name, expire=15, wait_expire=10):
+        super().__init__(r, name, 1, expire, wait_expire)
@@ -0,0 +1,183 @@
+"""
+Leaderboard particionado em N sorted sets (shards).
+
+Cada jogador vive em um único shard, escolhido por CRC32 do nome, então as
+escritas se espalham entre várias chaves. As leituras juntam os shards:
+o top-N é um merge k-way dos top-N de cada shard e a posição global é a soma
+dos ZCOUNT de cada shard, tudo em um único pipeline.
+
+Em Redis Cluster os shards (sem hash tag) caem em slots diferentes e os
+pipelines são divididos por nó pelo próprio cliente.
+
+A API é a mesma de leaderboard.py, com o parâmetro extra `shards`. Jogadores
+empatados dividem a mesma posição (ranking de competição).
+"""
+
+import heapq
+import zlib
+
+from redis.exceptions import NoScriptError
+
+from lua_scripts import REGISTRY
+from redis_client import get_redis
+
+DEFAULT_SHARDS = 8
+
+# Onde (score, jogador) entraria no shard em ordem decrescente, e os vizinhos
+# ao redor dessa posição: {nº com score maior, posição, membro1, score1, ...}.
+# O jogador não precisa estar no shard. Nos empates o Redis ordena os membros
+# por bytes; a busca binária compara byte a byte (o `>` do Lua usa o locale).
+REGISTRY.register('shard_around', """
+local function after(a, b)
+    for i = 1, math.min(#a, #b) do
+        local x, y = a:byte(i), b:byte(i)
+        if x ~= y then return x > y end
+    end
+    return #a > #b
+end
+local key, player, score = KEYS[1], ARGV[1], ARGV[2]
+local above = redis.call('ZCOUNT', key, '(' .. score, '+inf')
+-- Empatados ocupam as posições crescentes [lo, hi); acha o primeiro > player
+local lo = redis.call('ZCOUNT', key, '-inf', '(' .. score)
+local hi = lo + redis.call('ZCOUNT', key, score, score)
+local first, last = lo, hi
+while first < last do
+    local mid = math.floor((first + last) / 2)
+    if after(redis.call('ZRANGE', key, mid, mid)[1], player) then
+        last = mid
+    else
+        first = mid + 1
+    end
+end
+local pos = above + hi - first
+local range = tonumber(ARGV[3])
+local start = math.max(0, pos - range)
+local around = redis.call('ZREVRANGE', key, start, pos + range, 'WITHSCORES')
+table.insert(around, 1, pos)
+table.insert(around, 1, above)
+return around
+""")
+
+def shard_keys(key='leaderboard_demo', shards=DEFAULT_SHARDS):
+    return [f"{key}:shard:{n}" for n in range(shards)]
+
+def shard_for(player, key='leaderboard_demo', shards=DEFAULT_SHARDS):
+    return f"{key}:shard:{zlib.crc32(player.encode()) % shards}"
+
+def add_score(player, score, key='leaderboard_demo', shards=DEFAULT_SHARDS):
+    r = get_redis()
+    r.zadd(shard_for(player, key, shards), {player: score})
+    print(f"✅ Pontuação de {player}: {score} pontos")
+
+def increment_score(player, increment=1.0, key='leaderboard_demo', shards=DEFAULT_SHARDS):
+    r = get_redis()
+    new_score = r.zincrby(shard_for(player, key, shards), increment, player)
+    if isinstance(new_score, (int, float)):
+        print(f"✅ {player} ganhou {increment} pontos! Total: {new_score}")
+        return new_score
+    return 0
+
+def _merge_desc(lists, limit):
+    # ZREVRANGE ordena por (score, membro) decrescente; o merge mantém essa ordem
+    merged = heapq.merge(*lists, key=lambda item: (item[1], item[0]), reverse=True)
+    return [item for _, item in zip(range(limit), merged)]
+
+def get_top_players(limit=10, key='leaderboard_demo', shards=DEFAULT_SHARDS):
+    r = get_redis()
+    pipe = r.pipeline(transaction=False)
+    for shard in shard_keys(key, shards):
+        pipe.zrevrange(shard, 0, limit-1, withscores=True)
+    return _merge_desc(pipe.execute(), limit)
+
+def get_player_rank(player, key='leaderboard_demo', shards=DEFAULT_SHARDS):
+    r = get_redis()
+    score = r.zscore(shard_for(player, key, shards), player)
+    if score is None:
+        return (None, None)
+    pipe = r.pipeline(transaction=False)
+    for shard in shard_keys(key, shards):
+        pipe.zcount(shard, f"({score}", "+inf")
+    return (sum(pipe.execute())+1, score)
+
+def get_player_ranks(players, key='leaderboard_demo', shards=DEFAULT_SHARDS, chunk_size=1000):
+    """Versão em lote de get_player_rank: dois pipelines por bloco de jogadores."""
+    r = get_redis()
+    players = list(dict.fromkeys(players))
+    keys = shard_keys(key, shards)
+    result = {}
+    for i in range(0, len(players), chunk_size):
+        chunk = players[i:i+chunk_size]
+        pipe = r.pipeline(transaction=False)
+        for player in chunk:
+            pipe.zscore(shard_for(player, key, shards), player)
+        scores = dict(zip(chunk, pipe.execute()))
+        found = [p for p in chunk if scores[p] is not None]
+        pipe = r.pipeline(transaction=False)
+        for player in found:
+            for shard in keys:
+                pipe.zcount(shard, f"({scores[player]}", "+inf")
+        counts = pipe.execute()
+        for n, player in enumerate(found):
+            above = sum(counts[n*shards:(n+1)*shards])
+            result[player] = (above+1, scores[player])
+        for player in chunk:
+            result.setdefault(player, (None, None))
+    return result
+
+def get_players_around(player, range_size=2, key='leaderboard_demo', shards=DEFAULT_SHARDS):
+    r = get_redis()
+    score = r.zscore(shard_for(player, key, shards), player)
+    if score is None:
+        return []
+    keys = shard_keys(key, shards)
+    # Em cada shard, os `range_size` membros logo acima e logo abaixo de
+    # (score, player) na ordem do ZSET: a janela global está na união deles
+    pipe = r.pipeline(transaction=False)
+    for shard in keys:
+        REGISTRY.queue_sha(pipe, r, 'shard_around', [shard], [player, repr(score), range_size])
+    replies = pipe.execute(raise_on_error=False)
+    above, candidates = 0, {}
+    for shard, reply in zip(keys, replies):
+        if isinstance(reply, NoScriptError):
+            reply = REGISTRY.call(r, 'shard_around', [shard], [player, repr(score), range_size])
+        elif isinstance(reply, Exception):
+            raise reply
+        above += reply[0]
+        flat = reply[2:]
+        candidates.update((p, float(s)) for p, s in zip(flat[0::2], flat[1::2]))
+    ordered = sorted(candidates.items(), key=lambda item: (item[1], item[0]), reverse=True)
+    idx = next((i for i, (p, _) in enumerate(ordered) if p == player), None)
+    if idx is None:
+        return []  # removido entre o ZSCORE e o script
+    window = ordered[max(0, idx-range_size):idx+range_size+1]
+    # Posição de competição de cada vizinho: 1 + jogadores com pontuação maior
+    ranks = {score: above+1}
+    others = sorted({s for _, s in window} - {score})
+    if others:
+        pipe = r.pipeline(transaction=False)
+        for s in others:
+            for shard in keys:
+                pipe.zcount(shard, f"({s}", "+inf")
+        counts = pipe.execute()
+        for n, s in enumerate(others):
+            ranks[s] = sum(counts[n*shards:(n+1)*shards])+1
+    return [(ranks[s], p, s) for p, s in window]
+
+def remove_player(player, key='leaderboard_demo', shards=DEFAULT_SHARDS):
+    r = get_redis()
+    removed = r.zrem(shard_for(player, key, shards), player)
+    return isinstance(removed, int) and removed > 0
+
+def clear_leaderboard(key='leaderboard_demo', shards=DEFAULT_SHARDS):
+    r = get_redis()
+    r.delete(*shard_keys(key, shards))
+    print("🗑️ Leaderboard limpo!")
+
+def display_leaderboard(title="🏆 LEADERBOARD", key='leaderboard_demo', shards=DEFAULT_SHARDS):
+    print(f"\n{title}")
+    print("-"*30)
+    players = get_top_players(10, key, shards)
+    if not players:
+        print("(vazio)")
+    for i, (player, score) in enumerate(players, 1):
+        print(f"{i:2d}. {player:<20} {score:>8.0f} pts")
@@ -0,0 +1,148 @@
+"""
+Chat durável sobre Redis Streams.
+
+Diferente do Pub/Sub, as mensagens ficam gravadas no stream `chat:stream:<canal>`
+(limitado com XADD MAXLEN ~), então quem reconecta continua de onde parou.
+
+- Consumidores no mesmo grupo dividem as mensagens entre si (escala horizontal);
+  grupos diferentes recebem, cada um, todas as mensagens.
+- As leituras usam XREADGROUP COUNT, então o atraso é recuperado em lotes.
+- Mensagens entregues a um consumidor que morreu sem dar XACK são
+  reivindicadas com XAUTOCLAIM depois de `claim_idle_ms`.
+
+Uso: python stream_chat.py pub|sub
+"""
+
+import os
+import socket
+import sys
+import time
+
+import redis
+
+from redis_client import get_redis, max_block
+
+MAXLEN = 10000
+
+def stream_key(canal):
+    return f"chat:stream:{canal}"
+
+def send_message(r, canal, usuario, msg, maxlen=MAXLEN):
+    return r.xadd(stream_key(canal), {'user': usuario, 'msg': msg}, maxlen=maxlen, approximate=True)
+
+def ensure_group(r, canal, group, start_id='0'):
+    """Cria o grupo (e o stream) se ainda não existirem."""
+    try:
+        r.xgroup_create(stream_key(canal), group, id=start_id, mkstream=True)
+    except redis.ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+class StreamConsumer:
+    def __init__(self, r, canal, group, consumer, count=100, block_ms=5000,
+                 claim_idle_ms=30000, claim_interval=10.0):
+        self.r = r
+        self.key = stream_key(canal)
+        self.group = group
+        self.consumer = consumer
+        self.count = count
+        # O BLOCK precisa terminar antes do socket_timeout do cliente
+        cap = max_block(r)
+        self.block_ms = block_ms if cap is None else min(block_ms, int(cap*1000))
+        self.claim_idle_ms = claim_idle_ms
+        self.claim_interval = claim_interval
+        self.stats = {'read': 0, 'reclaimed': 0, 'acked': 0}
+        self._last_claim = 0.0
+        # Primeiro reprocessa o que ficou pendente para este consumidor
+        self._backlog = True
+        ensure_group(r, canal, group)
+
+    def read_batch(self):
+        """Retorna uma lista [(id, campos)] de até `count` mensagens."""
+        if self._backlog:
+            entries = self._read('0', block=None)
+            if entries:
+                return entries
+            self._backlog = False
+        if time.monotonic() - self._last_claim >= self.claim_interval:
+            self._last_claim = time.monotonic()
+            claimed = self.reclaim()
+            if claimed:
+                return claimed
+        return self._read('>', block=self.block_ms)
+
+    def reclaim(self):
+        """Assume mensagens paradas há mais de claim_idle_ms em consumidores mortos."""
+        claimed = []
+        start = '0-0'
+        while len(claimed) < self.count:
+            reply = self.r.xautoclaim(self.key, self.group, self.consumer, self.claim_idle_ms,
+                                      start_id=start, count=self.count-len(claimed))
+            start, entries = reply[0], reply[1]
+            claimed.extend(e for e in entries if e and e[1] is not None)
+            if start in ('0-0', b'0-0'):
+                break
+        self.stats['reclaimed'] += len(claimed)
+        return claimed
+
+    def ack(self, ids):
+        if ids:
+            self.stats['acked'] += self.r.xack(self.key, self.group, *ids)
+
+    def run(self, handler):
+        """Chama `handler(lista)` para cada lote e confirma o lote inteiro com um XACK."""
+        while True:
+            entries = self.read_batch()
+            if not entries:
+                continue
+            # Entradas já removidas pelo MAXLEN chegam sem campos; só confirmamos
+            live = [entry for entry in entries if entry[1] is not None]
+            if live:
+                handler(live)
+            self.ack([entry_id for entry_id, _ in entries])
+
+    def _read(self, last_id, block):
+        reply = self.r.xreadgroup(self.group, self.consumer, {self.key: last_id},
+                                  count=self.count, block=block)
+        entries = reply[0][1] if reply else []
+        self.stats['read'] += len(entries)
+        return entries
+
+
+def run_publisher():
+    r = get_redis()
+    canal = input('Canal para publicar: ')
+    usuario = input('Seu nome: ')
+    print('Digite mensagens para enviar. Ctrl+C para sair.')
+    try:
+        while True:
+            msg = input('Mensagem: ')
+            if msg.strip():
+                msg_id = send_message(r, canal, usuario, msg)
+                print(f'📤 Gravada no stream ({msg_id})')
+    except KeyboardInterrupt:
+        print('\nSaindo do publisher.')
+
+def run_subscriber():
+    r = get_redis()
+    canal = input('Canal para assinar: ')
+    group = input('Grupo de leitura (padrão: seu usuário): ').strip() or os.getenv('USER', 'leitores')
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    reader = StreamConsumer(r, canal, group, consumer)
+    print(f'👂 Lendo o stream "{reader.key}" no grupo "{group}"... Ctrl+C para sair.')
+
+    def show(entries):
+        for _, fields in entries:
+            print(f"📨 {fields.get('user')}: {fields.get('msg')}")
+
+    try:
+        reader.run(show)
+    except KeyboardInterrupt:
+        print('\nSaindo do subscriber.')
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'pub':
+        run_publisher()
+    else:
+        run_subscriber()
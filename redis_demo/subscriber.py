@@ -1,22 +1,29 @@
-from redis_client import get_redis
+from dispatcher import PubSubDispatcher
+from redis_client import is_cluster
+
+def show(data, channel):
+    print(f'📨 [{channel}] {data}')
 
 def main():
-    r = get_redis()
-    canal = input('Canal para assinar: ')
-    pubsub = r.pubsub()
-    pubsub.subscribe(canal)
-    print(f'👂 Aguardando mensagens no canal "{canal}"... Ctrl+C para sair.')
+    canais = input('Canais para assinar (separados por vírgula, aceita padrões como sala:*): ')
+    dispatcher = PubSubDispatcher()
+    # Em cluster o publisher usa SPUBLISH; padrões só recebem PUBLISH clássico
+    sharded = is_cluster(dispatcher.r)
+    nomes = [c.strip() for c in canais.split(',') if c.strip()]
+    for canal in nomes:
+        if any(ch in canal for ch in '*?['):
+            if sharded:
+                print(f'⚠️ Em cluster, o padrão {canal} não recebe mensagens do publisher (SPUBLISH)')
+            dispatcher.psubscribe(canal, show)
+        elif sharded:
+            dispatcher.ssubscribe(canal, show)
+        else:
+            dispatcher.subscribe(canal, show)
+    print(f'👂 Aguardando mensagens em {", ".join(nomes)}... Ctrl+C para sair.')
     try:
-        while True:
-            msg = pubsub.get_message(timeout=1.0)
-            if msg and isinstance(msg, dict) and msg.get('type') == 'message':
-                data = msg.get('data')
-                if data:
-                    print(f'📨 {data}')
+        dispatcher.run_forever()
     except KeyboardInterrupt:
         print('\nSaindo do subscriber.')
-    finally:
-        pubsub.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,42 @@
+"""
+Regressão de sharded_leaderboard.get_players_around com muitos empates:
+compara cada janela com a de um único ZSET com os mesmos jogadores.
+
+    python test_sharded_leaderboard.py    (ou pytest, com o Redis no ar)
+"""
+
+import random
+
+import sharded_leaderboard
+from redis_client import get_redis
+
+KEY = 'test_sharded_ties'
+
+def reference_around(r, ref, player, range_size):
+    rank = r.zrevrank(ref, player)
+    start = max(0, rank - range_size)
+    window = r.zrevrange(ref, start, rank + range_size, withscores=True)
+    return [(r.zcount(ref, f"({score}", "+inf")+1, p, score) for p, score in window]
+
+def test_players_around_with_ties(players=60, shards=4, range_size=2):
+    r = get_redis()
+    ref = f"{KEY}:ref"
+    rng = random.Random(7)
+    scores = {f"p{i}": rng.choice([10, 20, 30]) for i in range(players)}
+    sharded_leaderboard.clear_leaderboard(KEY, shards)
+    r.delete(ref)
+    try:
+        r.zadd(ref, scores)
+        for player, score in scores.items():
+            r.zadd(sharded_leaderboard.shard_for(player, KEY, shards), {player: score})
+        for player in scores:
+            got = sharded_leaderboard.get_players_around(player, range_size, KEY, shards)
+            want = reference_around(r, ref, player, range_size)
+            assert got == want, f"{player}: {got} != {want}"
+    finally:
+        sharded_leaderboard.clear_leaderboard(KEY, shards)
+        r.delete(ref)
+
+if __name__ == '__main__':
+    test_players_around_with_ties()
+    print('✅ get_players_around confere com um único ZSET')
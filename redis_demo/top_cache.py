@@ -0,0 +1,156 @@
+"""
+Cache local (em processo) do top-N dos leaderboards.
+
+As entradas expiram por TTL e são invalidadas por keyspace notifications
+do próprio Redis, de modo que escritas feitas por outros processos também
+derrubam o cache. Enquanto a inscrição de uma chave não é confirmada pelo
+servidor, as leituras dessa chave passam direto para o Redis. Se não dá
+para confirmar que as notificações estão ligadas (CONFIG SET recusado, como
+em muitos Redis gerenciados, ou flags sem K), o cache fica desligado e toda
+leitura passa direto: um top-N velho nunca é servido.
+
+Não funciona em Redis Cluster: as notificações são emitidas só pelo nó dono
+da chave, e a conexão de Pub/Sub fica em um único nó.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from redis_client import get_redis, is_cluster
+
+# K = keyspace, z = comandos de sorted set, g = DEL/EXPIRE/RENAME etc.
+NOTIFY_FLAGS = "Kzg"
+
+def notifications_cover(flags):
+    """As flags de notify-keyspace-events avisam toda escrita em um ZSET?"""
+    return 'K' in flags and ('A' in flags or ('z' in flags and 'g' in flags))
+
+
+class TopNCache:
+    """Cache LRU de resultados de ZREVRANGE por chave, com TTL."""
+
+    def __init__(self, max_keys=128, ttl=5.0):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'bypassed': 0}
+        self._r = get_redis()
+        if is_cluster(self._r):
+            raise ValueError("Cache do top-N não suportado em cluster (notificações são locais a cada nó)")
+        self._db = self._r.connection_pool.connection_kwargs.get('db', 0)
+        self._entries = OrderedDict()   # key -> (limit, resultado, expira_em)
+        self._generation = {}           # key -> contador de invalidações
+        self._subscribed = set()        # chaves com inscrição confirmada
+        self._requested = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.enabled = self._enable_notifications()
+        self._pubsub = self._r.pubsub()
+        self._thread = None
+
+    def get(self, key, limit, loader):
+        """Retorna o top `limit` de `key`, chamando `loader(key, limit)` em caso de miss."""
+        if not self.enabled:
+            self.stats['bypassed'] += 1
+            return loader(key, limit)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] >= limit and entry[2] > now:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[1][:limit]
+            self.stats['misses'] += 1
+            generation = self._generation.get(key, 0)
+            cacheable = key in self._subscribed
+        if not cacheable:
+            self._watch(key)
+        result = loader(key, limit)
+        if cacheable:
+            with self._lock:
+                # Só grava se nenhuma invalidação chegou durante a leitura
+                if self._generation.get(key, 0) == generation:
+                    self._entries[key] = (limit, result, now + self.ttl)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_keys:
+                        self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation[key] = self._generation.get(key, 0) + 1
+            if self._entries.pop(key, None) is not None:
+                self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._generation) + list(self._entries):
+                self._generation[key] = self._generation.get(key, 0) + 1
+            self._entries.clear()
+
+    def close(self):
+        self._closed = True
+        self._pubsub.close()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+
+    def _notify_flags(self):
+        return self._r.config_get('notify-keyspace-events').get('notify-keyspace-events', '')
+
+    def _enable_notifications(self):
+        """Liga as flags que faltam e confirma no servidor. False = cache desligado."""
+        try:
+            current = self._notify_flags()
+            if not notifications_cover(current):
+                wanted = NOTIFY_FLAGS if 'A' not in current else 'K'
+                missing = ''.join(f for f in wanted if f not in current)
+                self._r.config_set('notify-keyspace-events', current + missing)
+                current = self._notify_flags()
+            if notifications_cover(current):
+                return True
+            print(f"⚠️ notify-keyspace-events='{current}' não cobre os ZSETs; cache do top-N desligado")
+        except Exception as e:
+            print(f"⚠️ Não foi possível ativar keyspace notifications ({e}); cache do top-N desligado")
+        return False
+
+    def _channel(self, key):
+        return f"__keyspace@{self._db}__:{key}"
+
+    def _watch(self, key):
+        with self._lock:
+            if key in self._requested:
+                return
+            self._requested.add(key)
+        self._pubsub.subscribe(self._channel(key))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._listen, name='top-cache', daemon=True)
+            self._thread.start()
+
+    def _listen(self):
+        prefix = len(self._channel(''))
+        while not self._closed:
+            try:
+                msg = self._pubsub.get_message(timeout=30.0)
+            except Exception:
+                if self._closed:
+                    return
+                # Conexão caiu: não dá para saber o que foi perdido, e o
+                # servidor pode ter voltado sem as notificações
+                with self._lock:
+                    self._subscribed.clear()
+                self.clear()
+                time.sleep(0.5)
+                try:
+                    self.enabled = self._enable_notifications()
+                except Exception:
+                    self.enabled = False
+                continue
+            if not msg:
+                continue
+            key = msg['channel'][prefix:]
+            if msg['type'] == 'subscribe':
+                with self._lock:
+                    self._subscribed.add(key)
+                self.invalidate(key)
+            elif msg['type'] == 'message':
+                self.invalidate(key)
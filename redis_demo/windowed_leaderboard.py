@@ -0,0 +1,242 @@
+"""
+Leaderboards por janela de tempo: hora atual, dia atual, semana atual e geral.
+
+Cada escrita atualiza o ranking geral (`key`), com os complementos ativos
+para ele (ver leaderboard_writes.py), e soma os pontos ganhos no bucket da
+hora atual (`{key}:h:AAAAMMDDHH`, com TTL). As janelas maiores são
+rollups incrementais via ZUNIONSTORE:
+
+- `{key}:d:AAAAMMDD` acumula as horas já encerradas do dia;
+- `{key}:w:AAAAWW` acumula os dias já encerrados da semana (ISO);
+- `{key}:view:day` / `{key}:view:week` são views materializadas (parte fechada +
+  período corrente) com TTL curto, então a maioria das leituras é um único
+  ZREVRANGE.
+
+Cada hora/dia entra no rollup uma única vez; o controle fica no hash
+`{key}:rollup`, atualizado atomicamente junto com o ZUNIONSTORE. A hash tag
+`{key}` põe todas essas chaves no slot de `key`, o que permite os scripts e
+ZUNIONSTOREs também em Redis Cluster.
+
+As janelas medem pontos ganhos no período (também para add_score, que
+registra a diferença em relação à pontuação anterior). Horários em UTC, pelo
+relógio do servidor (TIME), o mesmo para escritas e rollups.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from leaderboard_writes import HOOKS_LUA, hook_keys
+from redis_client import colocated, get_redis
+
+WINDOWS = ('hour', 'day', 'week', 'all')
+HOUR_TTL = 8*24*3600
+DAY_TTL = 8*24*3600
+WEEK_TTL = 15*24*3600
+VIEW_TTL = 5
+
+# Atualiza o geral e o bucket da hora com a diferença de pontuação (1 RTT).
+# A hora vem do TIME do servidor, o mesmo relógio de quem fecha os rollups.
+# Se a hora (ou o dia) já entrou em `{key}:d:` (ou `{key}:w:`) segundo
+# `{key}:rollup`, a diferença também vai para a parte fechada: senão ela se
+# perderia nas views de dia e semana. As chaves de janela são montadas a
+# partir de ARGV[4] (prefixo com a hash tag de `key`), no mesmo slot de KEYS.
+# Pontuações e diferenças vão como strings: o tostring do Lua tem 14 dígitos.
+# Os ganchos do leaderboard (histograma, feed) vêm de HOOKS_LUA, com as
+# chaves de hook_keys logo após KEYS[2].
+_WRITE_LUA = HOOKS_LUA + """
+local function civil(days)
+    local z = days + 719468
+    local era = math.floor(z / 146097)
+    local doe = z - era * 146097
+    local yoe = math.floor((doe - math.floor(doe / 1460) + math.floor(doe / 36524) - math.floor(doe / 146096)) / 365)
+    local doy = doe - (365 * yoe + math.floor(yoe / 4) - math.floor(yoe / 100))
+    local mp = math.floor((5 * doy + 2) / 153)
+    local d = doy - math.floor((153 * mp + 2) / 5) + 1
+    local m = mp < 10 and mp + 3 or mp - 9
+    local y = yoe + era * 400 + (m <= 2 and 1 or 0)
+    return y, m, d
+end
+local function jan1(y)
+    local era = math.floor((y - 1) / 400)
+    local yoe = y - 1 - era * 400
+    return era * 146097 + yoe * 365 + math.floor(yoe / 4) - math.floor(yoe / 100) + 306 - 719468
+end
+local t = redis.call('TIME')
+local days = math.floor(tonumber(t[1]) / 86400)
+local y, m, d = civil(days)
+local day = string.format('%04d%02d%02d', y, m, d)
+local hour = string.format('%02d', math.floor(tonumber(t[1]) % 86400 / 3600))
+-- Semana ISO: a da quinta-feira da semana corrente
+local thursday = days - (days + 3) % 7 + 3
+local wy = civil(thursday)
+local week = string.format('%04d%02d', wy, math.floor((thursday - jan1(wy)) / 7) + 1)
+
+local X = hooks_open(KEYS[1], 3)
+local B = hooks_before(X, ARGV[1])
+local old = B.score
+local new, delta
+if ARGV[3] == 'set' then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+    new = ARGV[2]
+    delta = string.format('%.17g', tonumber(new) - tonumber(old or '0'))
+else
+    new = redis.call('ZINCRBY', KEYS[1], ARGV[2], ARGV[1])
+    delta = ARGV[2]
+end
+hooks_after(X, ARGV[1], B, new)
+if tonumber(delta) ~= 0 then
+    local prefix = ARGV[4]
+    local hour_key = prefix .. 'h:' .. day .. hour
+    redis.call('ZINCRBY', hour_key, delta, ARGV[1])
+    redis.call('EXPIRE', hour_key, ARGV[5])
+    local hours_done = redis.call('HGET', KEYS[2], 'd:' .. day)
+    if hours_done and tonumber(hours_done) >= tonumber(hour) then
+        local day_key = prefix .. 'd:' .. day
+        redis.call('ZINCRBY', day_key, delta, ARGV[1])
+        redis.call('EXPIRE', day_key, ARGV[6])
+        local days_done = redis.call('HGET', KEYS[2], 'w:' .. week)
+        if days_done and tonumber(days_done) >= tonumber(day) then
+            local week_key = prefix .. 'w:' .. week
+            redis.call('ZINCRBY', week_key, delta, ARGV[1])
+            redis.call('EXPIRE', week_key, ARGV[7])
+        end
+    end
+end
+return new
+"""
+
+# Soma as fontes ainda não incluídas no rollup, se ninguém fez isso antes
+_ROLLUP_LUA = """
+local done = redis.call('HGET', KEYS[2], ARGV[1]) or ''
+if done ~= ARGV[2] then
+    return 0
+end
+local sources = {KEYS[1]}
+for i = 3, #KEYS do
+    sources[#sources+1] = KEYS[i]
+end
+redis.call('ZUNIONSTORE', KEYS[1], #sources, unpack(sources))
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+_scripts = {}
+
+def _script(r, name, body):
+    if name not in _scripts:
+        _scripts[name] = r.register_script(body)
+    return _scripts[name]
+
+def _now(r):
+    """Hora do servidor: escritas e rollups usam o mesmo relógio."""
+    seconds, micros = r.time()
+    return datetime.fromtimestamp(seconds + micros/1e6, timezone.utc)
+
+def _hour_key(key, t):
+    return colocated(key, f"h:{t:%Y%m%d%H}")
+
+def _day_key(key, t):
+    return colocated(key, f"d:{t:%Y%m%d}")
+
+def _week_key(key, t):
+    year, week, _ = t.isocalendar()
+    return colocated(key, f"w:{year}{week:02d}")
+
+def _write(player, value, mode, key):
+    r = get_redis()
+    write = _script(r, 'write', _WRITE_LUA)
+    args = [player, value, mode, colocated(key, ''), HOUR_TTL, DAY_TTL, WEEK_TTL]
+    return float(write(keys=[key, colocated(key, 'rollup')] + hook_keys(key), args=args))
+
+def add_score(player, score, key='leaderboard_demo'):
+    _write(player, score, 'set', key)
+    print(f"✅ Pontuação de {player}: {score} pontos")
+
+def increment_score(player, increment=1.0, key='leaderboard_demo'):
+    new_score = _write(player, increment, 'incr', key)
+    print(f"✅ {player} ganhou {increment} pontos! Total: {new_score}")
+    return new_score
+
+def _rollup(r, part, field, labels, sources, ttl, key):
+    """Inclui em `part` as fontes de `labels` que ainda não foram somadas."""
+    rollup = _script(r, 'rollup', _ROLLUP_LUA)
+    state = colocated(key, 'rollup')
+    while True:
+        done = r.hget(state, field) or ''
+        pending = labels[labels.index(done)+1:] if done in labels else labels
+        if not pending:
+            return
+        keys = [part, state] + [sources[label] for label in pending]
+        if rollup(keys=keys, args=[field, done, pending[-1], ttl]):
+            return
+
+def _close_day(r, key, day, until_hour):
+    """Garante que `{key}:d:<dia>` contém as horas 0..until_hour-1."""
+    hours = [day + timedelta(hours=h) for h in range(until_hour)]
+    labels = [f"{h:%H}" for h in hours]
+    sources = {f"{h:%H}": _hour_key(key, h) for h in hours}
+    _rollup(r, _day_key(key, day), f"d:{day:%Y%m%d}", labels, sources, DAY_TTL, key)
+
+def _refresh_view(r, window, key, now):
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    today = hour.replace(hour=0)
+    _close_day(r, key, today, now.hour)
+    sources = [_day_key(key, today), _hour_key(key, hour)]
+    if window == 'week':
+        monday = today - timedelta(days=today.weekday())
+        days = [monday + timedelta(days=d) for d in range(today.weekday())]
+        for day in days:
+            _close_day(r, key, day, 24)
+        labels = [f"{d:%Y%m%d}" for d in days]
+        day_sources = {f"{d:%Y%m%d}": _day_key(key, d) for d in days}
+        week = _week_key(key, today)
+        _rollup(r, week, f"w:{week.rsplit(':', 1)[1]}", labels, day_sources, WEEK_TTL, key)
+        sources.append(week)
+    view = colocated(key, f"view:{window}")
+    pipe = r.pipeline()
+    pipe.zunionstore(view, sources)
+    pipe.expire(view, VIEW_TTL)
+    pipe.execute()
+    return view
+
+def window_key(window='all', key='leaderboard_demo'):
+    """Retorna a chave (ZSET) que contém o ranking da janela pedida."""
+    if window not in WINDOWS:
+        raise ValueError(f"Janela inválida: {window}")
+    if window == 'all':
+        return key
+    r = get_redis()
+    now = _now(r)
+    if window == 'hour':
+        return _hour_key(key, now)
+    view = colocated(key, f"view:{window}")
+    if r.exists(view):
+        return view
+    return _refresh_view(r, window, key, now)
+
+def get_top_players(limit=10, window='all', key='leaderboard_demo'):
+    r = get_redis()
+    result = r.zrevrange(window_key(window, key), 0, limit-1, withscores=True)
+    return result if isinstance(result, list) else []
+
+def get_player_rank(player, window='all', key='leaderboard_demo'):
+    r = get_redis()
+    pipe = r.pipeline(transaction=False)
+    zkey = window_key(window, key)
+    pipe.zrevrank(zkey, player)
+    pipe.zscore(zkey, player)
+    rank, score = pipe.execute()
+    if rank is not None and isinstance(rank, int):
+        return (rank+1, score)
+    return (None, None)
+
+def display_leaderboard(window='all', key='leaderboard_demo'):
+    titles = {'hour': "⏱️ TOP DA HORA", 'day': "📅 TOP DO DIA",
+              'week': "🗓️ TOP DA SEMANA", 'all': "🏆 LEADERBOARD GERAL"}
+    print(f"\n{titles[window]}")
+    print("-"*30)
+    players = get_top_players(10, window, key)
+    if not players:
+        print("(vazio)")
+    for i, (player, score) in enumerate(players, 1):
+        print(f"{i:2d}. {player:<20} {score:>8.0f} pts")